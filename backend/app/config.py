@@ -12,6 +12,18 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int = 15
     refresh_token_expire_days: int = 7
     cookie_secure: bool = False  # True in production (HTTPS only)
+    user_cache_ttl_seconds: int = 60  # authenticated principal cache
+    user_cache_max_entries: int = 10000
+    token_cache_max_entries: int = 10000  # verified JWTs; 0 disables the cache
+    token_cache_max_ttl_seconds: int = 900  # capped further by each token's exp
+    password_hash_workers: int = 4  # bcrypt threads per process (~1 per core)
+    password_hash_queue_limit: int = 64  # waiting jobs before answering 503
+    login_throttle_backend: str = "memory"  # memory | redis | none
+    login_throttle_ip_capacity: int = 20  # burst of attempts per client IP
+    login_throttle_ip_per_minute: float = 10
+    login_throttle_email_capacity: int = 5  # burst of attempts per account
+    login_throttle_email_per_minute: float = 2
+    login_throttle_max_keys: int = 100000
     model_config = SettingsConfigDict(
         env_file=".env",  # load from .env in project root
         env_file_encoding="utf-8",
@@ -26,6 +38,52 @@ class Settings(BaseSettings):
     # ── Database ───────────────────────────────────────────────────────────────────
     database_url: str = "sqlite+aiosqlite:///./app.db"
     db_echo: bool = False
+    database_read_url: str | None = None  # optional replica for catalog reads
+    # After a write, the same client reads from the primary for this long;
+    # also the replica lag the response cache allows for
+    read_your_writes_seconds: float = 5
+    # Per process: workers x (pool size + overflow) must fit max_connections
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30  # seconds to wait for a free connection
+    db_pool_recycle: int = 1800  # reopen older connections; -1 never
+    db_pool_pre_ping: bool = True  # test connections on checkout
+    db_statement_cache_size: int = 100  # asyncpg; 0 behind PgBouncer
+    # SQLite only (the default for small stores)
+    sqlite_wal: bool = True  # readers no longer wait for writes
+    sqlite_synchronous: str = "NORMAL"  # OFF | NORMAL | FULL; NORMAL is safe with WAL
+    sqlite_busy_timeout_ms: int = 5000  # wait for a lock instead of failing
+    sqlite_mmap_size_mb: int = 256
+    sqlite_cache_size_mb: int = 64  # page cache per connection
+    sqlite_single_writer: bool = True  # serialize writes on one connection
+
+    # ── Catalog listing ───────────────────────────────────────────────────────────
+    storefront_total_mode: str = "exact"  # exact | cached | estimate
+    product_count_cache_ttl_seconds: int = 30
+    product_count_cache_max_entries: int = 1024
+    facet_price_buckets: list[float] = [5, 10, 20, 50, 100]  # bucket upper bounds
+
+    # ── Response cache ───────────────────────────────────────────────────────────
+    response_cache_backend: str = "memory"  # memory | redis | none
+    response_cache_ttl_seconds: int = 60
+    response_cache_max_entries: int = 2048
+    redis_url: str = "redis://localhost:6379/0"
+
+    # ── Scheduled jobs ───────────────────────────────────────────────────────────
+    discount_expiry_batch_size: int = 1000  # upcoming end dates kept in memory
+    # Reload them from the database; also how late the leader notices end
+    # dates written by other workers (the read-time guard covers the gap)
+    discount_expiry_resync_seconds: int = 60
+    scheduler_leader_backend: str = "auto"  # auto | advisory | file | none
+    scheduler_lock_file: str = "scheduler.lock"  # file backend, same host only
+    scheduler_leader_retry_seconds: float = 10  # failover / lock check interval
+    job_run_retention_days: int = 30
+
+    # ── Metrics ───────────────────────────────────────────────────────────────────
+    # Off by default: the scrape endpoint exposes pool, cache and throttle
+    # internals. When enabled, scrapers send "Authorization: Bearer <token>"
+    metrics_enabled: bool = False
+    metrics_token: str | None = None
 
     # ── CORS ───────────────────────────────────────────────────────────────────
     allowed_origins: list[AnyHttpUrl] = [
@@ -36,10 +94,19 @@ class Settings(BaseSettings):
     static_dir: str = "static"
     product_images_dir: str = "static/products"
     categories_images_dir: str = "static/categories"
+    static_max_age_seconds: int = 31536000  # immutable (hashed/versioned) URLs
+    image_gc_interval_hours: int = 24  # orphan image file collection
+    image_gc_grace_seconds: int = 3600  # never touch files younger than this
+    image_gc_batch_size: int = 500  # files / rows reconciled per step
+    image_gc_dry_run: bool = False  # report orphans without deleting them
 
     # ── Images ───────────────────────────────────────────────────────────────────
     allowed_image_types: set[str] = {"image/jpeg", "image/png", "image/webp"}
     max_image_size_mb: int = 1
+    max_batch_images: int = 20  # files per gallery upload request
+    image_variants_enabled: bool = True  # resized WebP/AVIF copies per upload
+    max_image_pixels: int = 40_000_000  # decoded size limit (decompression bombs)
+    image_variant_workers: int = 2  # processes rendering variants
 
     @field_validator("product_images_dir")
     @classmethod
@@ -0,0 +1,262 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+from urllib.parse import urlencode
+from uuid import uuid4
+
+from app.config import get_settings
+from app.core import metrics
+
+settings = get_settings()
+
+
+# ── TTL Cache ──────────────────────────────────────────────────────────────
+class TTLCache:
+    """
+    Bounded LRU mapping whose entries expire ``ttl`` seconds after being set.
+    Not thread-safe: meant to be used from the event loop only.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# ── Response cache backends ────────────────────────────────────────────────
+# Every backend also owns the catalog version: an opaque string that changes
+# on each invalidation. Callers embed it in their keys (and ETags), so entries
+# written before a catalog write can never be served after it.
+
+# Distinguishes per-process versions, so two workers never share a version
+# string for different catalog states
+_BOOT_ID = uuid4().hex[:8]
+
+_cache_hits = metrics.counter(
+    "shop_response_cache_hits_total", "Storefront response cache hits"
+)
+_cache_misses = metrics.counter(
+    "shop_response_cache_misses_total", "Storefront response cache misses"
+)
+_cache_evictions = metrics.counter(
+    "shop_response_cache_evictions_total",
+    "Entries evicted from the storefront response cache by the size bound",
+)
+
+
+def _count_lookup(value: bytes | None) -> bytes | None:
+    (_cache_misses if value is None else _cache_hits).inc()
+    return value
+
+
+class MemoryCacheBackend:
+    """Per-process LRU. Invalidation only reaches the worker that did the write."""
+
+    shared = False  # version is per process
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._cache = TTLCache(max_entries=max_entries, ttl=ttl)
+        self._generation = 0
+
+    async def version(self) -> str:
+        return f"{_BOOT_ID}.{self._generation}"
+
+    async def get(self, key: str) -> bytes | None:
+        return _count_lookup(self._cache.get(key))
+
+    async def set(self, key: str, value: bytes) -> None:
+        evictions = self._cache.evictions
+        self._cache.set(key, value)
+        _cache_evictions.inc(self._cache.evictions - evictions)
+
+    async def clear(self) -> None:
+        self._generation += 1
+        self._cache.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self._cache.hits,
+            "misses": self._cache.misses,
+            "evictions": self._cache.evictions,
+            "entries": len(self._cache),
+        }
+
+
+class RedisCacheBackend:
+    """
+    Cache shared by every worker. The catalog version is a Redis counter, so
+    invalidation is a single INCR and superseded entries age out through
+    their TTL (or Redis' own maxmemory eviction).
+    """
+
+    shared = True  # every worker sees the same version
+
+    def __init__(self, url: str, ttl: float, prefix: str = "shop:response"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError(
+                "response_cache_backend=redis requiere el paquete 'redis'"
+            ) from exc
+        self._redis = redis.from_url(url)
+        self._ttl = int(ttl)
+        self._prefix = prefix
+        self._hits = 0
+        self._misses = 0
+
+    async def version(self) -> str:
+        return str(int(await self._redis.get(f"{self._prefix}:generation") or 0))
+
+    async def get(self, key: str) -> bytes | None:
+        value = await self._redis.get(f"{self._prefix}:{key}")
+        if value is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+        return _count_lookup(value)
+
+    async def set(self, key: str, value: bytes) -> None:
+        await self._redis.set(f"{self._prefix}:{key}", value, ex=self._ttl)
+
+    async def clear(self) -> None:
+        await self._redis.incr(f"{self._prefix}:generation")
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": 0,
+            "entries": 0,
+        }
+
+
+class NullCacheBackend:
+    shared = False
+
+    def __init__(self):
+        self._generation = 0
+
+    async def version(self) -> str:
+        return f"{_BOOT_ID}.{self._generation}"
+
+    async def get(self, key: str) -> bytes | None:
+        return None
+
+    async def set(self, key: str, value: bytes) -> None:
+        pass
+
+    async def clear(self) -> None:
+        self._generation += 1
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": 0, "misses": 0, "evictions": 0, "entries": 0}
+
+
+def _build_response_cache():
+    if settings.response_cache_backend == "redis":
+        return RedisCacheBackend(
+            settings.redis_url, settings.response_cache_ttl_seconds
+        )
+    if settings.response_cache_backend == "memory":
+        return MemoryCacheBackend(
+            max_entries=settings.response_cache_max_entries,
+            ttl=settings.response_cache_ttl_seconds,
+        )
+    return NullCacheBackend()
+
+
+# ── Shared instances ───────────────────────────────────────────────────────
+# Serialized storefront responses, keyed by endpoint + normalized params
+response_cache = _build_response_cache()
+
+# (total, is_estimate) per product filter combination, see get_products
+count_cache = TTLCache(
+    max_entries=settings.product_count_cache_max_entries,
+    ttl=settings.product_count_cache_ttl_seconds,
+)
+
+
+def cache_key(namespace: str, **params: Any) -> str:
+    """Stable key: omitted/None params and argument order don't matter."""
+    items = sorted((k, str(v)) for k, v in params.items() if v is not None)
+    return f"{namespace}?{urlencode(items)}"
+
+
+async def catalog_version() -> str:
+    """Current catalog version; changes on every invalidate_catalog()."""
+    return await response_cache.version()
+
+
+_pending_invalidations: set[asyncio.Task] = set()
+
+
+async def _drop_catalog(delay: float = 0) -> None:
+    await asyncio.sleep(delay)
+    await response_cache.clear()
+    count_cache.clear()
+
+
+async def invalidate_catalog() -> None:
+    """
+    Bump the catalog version and drop every cached catalog read.
+    Call after any committed catalog write.
+    """
+    await _drop_catalog()
+    if settings.database_read_url:
+        # A read served by a lagging replica right after the write would be
+        # cached (and ETagged) under the new version; drop it all again once
+        # the replica has caught up
+        task = asyncio.create_task(_drop_catalog(settings.read_your_writes_seconds))
+        _pending_invalidations.add(task)
+        task.add_done_callback(_pending_invalidations.discard)
+
+
+def _hit_ratio() -> float:
+    stats = response_cache.stats()
+    lookups = stats["hits"] + stats["misses"]
+    return stats["hits"] / lookups if lookups else 0.0
+
+
+metrics.gauge(
+    "shop_response_cache_entries",
+    "Entries currently held by the storefront response cache",
+    lambda: response_cache.stats()["entries"],
+)
+metrics.gauge(
+    "shop_response_cache_hit_ratio", "Storefront response cache hit ratio", _hit_ratio
+)
@@ -1,17 +1,65 @@
-from fastapi import Depends, HTTPException, status, Cookie
+from dataclasses import dataclass
+from fastapi import Depends, HTTPException, Request, status, Cookie
+from fastapi.routing import APIRoute
 from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError
+from app.config import get_settings
+from app.core.cache import TTLCache
 from app.database import get_db  # re-exported from here for convenience
 from app.core.security import decode_token
 from app.models import User, UserRole
-from sqlalchemy import select
+from sqlalchemy import event, select
+
+settings = get_settings()
+
+
+# ── Authenticated principal cache ──────────────────────────────────────────
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    role: UserRole
+    is_active: bool
+
+
+# user id -> Principal, so most requests authenticate without a DB round trip
+_principal_cache = TTLCache(
+    max_entries=settings.user_cache_max_entries,
+    ttl=settings.user_cache_ttl_seconds,
+)
+
+
+def invalidate_user(user_id: int) -> None:
+    """Forget the cached principal; call when a user's role or status changes."""
+    _principal_cache.pop(user_id)
+
+
+@event.listens_for(User, "after_update")
+def _invalidate_updated_user(mapper, connection, target: User) -> None:
+    # Any ORM update (deactivation, role change) drops the cached principal;
+    # writes that bypass the ORM are bounded by the cache TTL.
+    invalidate_user(target.id)
+
+
+async def load_principal(db: AsyncSession, user_id: int) -> Principal | None:
+    """Cached principal for user_id, or None if the user doesn't exist."""
+    principal = _principal_cache.get(user_id)
+    if principal is None:
+        result = await db.execute(
+            select(User.id, User.role, User.is_active).where(User.id == user_id)
+        )
+        row = result.one_or_none()
+        if row is None:
+            return None
+        principal = Principal(id=row.id, role=row.role, is_active=row.is_active)
+        _principal_cache.set(user_id, principal)
+    return principal
 
 
 # ── Auth Dependencies ──────────────────────────────────────────────────────
-async def get_current_user(
+async def get_current_principal(
     access_token: str | None = Cookie(default=None),
     db: AsyncSession = Depends(get_db),
-) -> User:
+) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED, detail="Error en autorización"
     )
@@ -26,18 +74,93 @@ async def get_current_user(
     except (JWTError, ValueError):
         raise credentials_exception
 
-    result = await db.execute(select(User).where(User.id == user_pk))
+    principal = await load_principal(db, user_pk)
+    if principal is None or not principal.is_active:
+        raise credentials_exception
+
+    return principal
+
+
+async def get_current_user(
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+) -> User:
+    # Full row, for endpoints that actually return the user's profile
+    result = await db.execute(select(User).where(User.id == principal.id))
     user = result.scalar_one_or_none()
     if user is None or not user.is_active:
-        raise credentials_exception
+        invalidate_user(principal.id)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Error en autorización"
+        )
 
     return user
 
 
-async def require_admin(current_user: User = Depends(get_current_user)) -> User:
+async def require_admin(
+    current_user: Principal = Depends(get_current_principal),
+) -> Principal:
     if current_user.role != UserRole.admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Se requieren los derechos del admin para esta acción",
         )
     return current_user
+
+
+# ── Upload size guard ──────────────────────────────────────────────────────
+# Room for each part's boundary and headers on top of the file itself
+_MULTIPART_PART_OVERHEAD = 64 * 1024
+
+
+class UploadLimit:
+    """
+    Dependency for upload routes: answers 413 when the declared
+    Content-Length can't fit ``max_image_size_mb`` per image. UploadRoute
+    runs it before the multipart body is read; chunked requests (no
+    Content-Length) are left to the streaming check in save_image_upload.
+    """
+
+    def __init__(self, batch: bool = False):
+        self.batch = batch
+
+    def max_bytes(self) -> int:
+        files = settings.max_batch_images if self.batch else 1
+        per_file = settings.max_image_size_mb * 1024 * 1024
+        return files * (per_file + _MULTIPART_PART_OVERHEAD)
+
+    async def __call__(self, request: Request) -> None:
+        try:
+            declared = int(request.headers.get("content-length", ""))
+        except ValueError:
+            return
+        if declared > self.max_bytes():
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Imagen demasiado grande. Máximo {settings.max_image_size_mb}MB",
+            )
+
+
+class UploadRoute(APIRoute):
+    """
+    FastAPI parses the form before solving any dependency, so an oversized
+    upload would already be spooled to disk by the time UploadLimit ran.
+    This route class runs the route's UploadLimit first.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        limits = [
+            depends.dependency
+            for depends in self.dependencies
+            if isinstance(depends.dependency, UploadLimit)
+        ]
+        if not limits:
+            return handler
+
+        async def guarded_handler(request: Request):
+            for limit in limits:
+                await limit(request)
+            return await handler(request)
+
+        return guarded_handler
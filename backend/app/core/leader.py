@@ -0,0 +1,215 @@
+import asyncio
+import contextlib
+import hashlib
+import logging
+import os
+import socket
+from typing import Awaitable, Callable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.config import get_settings
+from app.core import metrics
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+_elections = metrics.counter(
+    "shop_scheduler_elections_total", "Times this process became scheduler leader"
+)
+
+
+# ── Lock backends ──────────────────────────────────────────────────────────
+# Both locks are tied to something the OS or the database tears down with
+# the process (a session, an open file), so a crashed leader never leaves
+# a stale lock behind.
+class AdvisoryLock:
+    """Session-level Postgres advisory lock held on a dedicated connection."""
+
+    def __init__(self, engine: AsyncEngine, name: str):
+        self._engine = engine
+        # pg advisory locks take a signed bigint key
+        digest = hashlib.sha256(name.encode()).digest()
+        self._key = int.from_bytes(digest[:8], "big", signed=True)
+        self._conn: AsyncConnection | None = None
+
+    async def try_acquire(self) -> bool:
+        conn = await self._engine.connect()
+        try:
+            # Autocommit so the session never sits "idle in transaction"
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            acquired = await conn.scalar(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": self._key}
+            )
+        except Exception:
+            await conn.close()
+            raise
+        if not acquired:
+            await conn.close()
+            return False
+        self._conn = conn
+        return True
+
+    async def is_held(self) -> bool:
+        try:
+            await self._conn.scalar(text("SELECT 1"))
+            return True
+        except Exception:
+            return False  # session gone, and the lock with it
+
+    async def release(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        # Dropping the session releases the lock even if an explicit unlock
+        # would fail; never hand a locked session back to the pool
+        with contextlib.suppress(Exception):
+            await conn.invalidate()
+        with contextlib.suppress(Exception):
+            await conn.close()
+
+
+class FileLock:
+    """
+    Exclusive OS lock on a file, for SQLite deployments where every worker
+    runs on the same host.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._file = None
+
+    async def try_acquire(self) -> bool:
+        file = open(self._path, "a+")
+        try:
+            if os.name == "nt":
+                import msvcrt
+
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            file.close()
+            return False
+        # Who holds it, for whoever opens the file while debugging
+        file.truncate(0)
+        file.write(WORKER_ID)
+        file.flush()
+        self._file = file
+        return True
+
+    async def is_held(self) -> bool:
+        return self._file is not None
+
+    async def release(self) -> None:
+        file, self._file = self._file, None
+        if file is None:
+            return
+        if os.name == "nt":
+            import msvcrt
+
+            with contextlib.suppress(OSError):
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+        file.close()  # closing the descriptor drops the flock
+
+
+class AlwaysLeader:
+    """Single-process deployments: no coordination needed."""
+
+    async def try_acquire(self) -> bool:
+        return True
+
+    async def is_held(self) -> bool:
+        return True
+
+    async def release(self) -> None:
+        pass
+
+
+def make_leader_lock(engine: AsyncEngine):
+    backend = settings.scheduler_leader_backend
+    if backend == "auto":
+        backend = "advisory" if engine.dialect.name == "postgresql" else "file"
+    if backend == "advisory":
+        return AdvisoryLock(engine, "shop-scheduler")
+    if backend == "file":
+        return FileLock(settings.scheduler_lock_file)
+    return AlwaysLeader()
+
+
+# ── Election ───────────────────────────────────────────────────────────────
+class LeaderElection:
+    """
+    Campaign for the scheduler lock in the background and run ``on_elected``
+    / ``on_demoted`` around leadership, so that across all workers and pods
+    exactly one process runs the scheduled jobs.
+
+    Followers retry every ``scheduler_leader_retry_seconds``: when the leader
+    dies its lock goes with it and another process takes over within that
+    interval. The leader re-checks its lock on the same beat and steps down
+    if it was lost (e.g. its database session was killed).
+    """
+
+    def __init__(
+        self,
+        lock,
+        on_elected: Callable[[], Awaitable[None]],
+        on_demoted: Callable[[], Awaitable[None]],
+    ):
+        self._lock = lock
+        self._on_elected = on_elected
+        self._on_demoted = on_demoted
+        self._task: asyncio.Task | None = None
+        self.is_leader = False
+        metrics.gauge(
+            "shop_scheduler_is_leader",
+            "1 if this process currently runs the scheduled jobs",
+            lambda: int(self.is_leader),
+        )
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._campaign())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self.is_leader:
+            await self._step_down()
+
+    async def _campaign(self) -> None:
+        while True:
+            try:
+                if self.is_leader:
+                    if not await self._lock.is_held():
+                        logger.warning("Scheduler leadership lost by %s", WORKER_ID)
+                        await self._step_down()
+                elif await self._lock.try_acquire():
+                    self.is_leader = True
+                    _elections.inc()
+                    logger.info("Scheduler leadership acquired by %s", WORKER_ID)
+                    await self._on_elected()
+            except Exception:
+                logger.exception("Scheduler leader election step failed")
+                if self.is_leader:
+                    with contextlib.suppress(Exception):
+                        await self._step_down()
+            await asyncio.sleep(settings.scheduler_leader_retry_seconds)
+
+    async def _step_down(self) -> None:
+        # Stop the jobs before letting go of the lock so two leaders never
+        # overlap on a clean hand-over
+        self.is_leader = False
+        try:
+            await self._on_demoted()
+        finally:
+            await self._lock.release()
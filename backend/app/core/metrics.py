@@ -0,0 +1,42 @@
+from typing import Callable
+
+
+# ── Metrics registry ───────────────────────────────────────────────────────
+# Minimal in-process registry rendered in the Prometheus text format by
+# GET /metrics. Values are per worker process.
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+
+_counters: dict[str, Counter] = {}
+_gauges: dict[str, tuple[str, Callable[[], float]]] = {}
+
+
+def counter(name: str, help_text: str) -> Counter:
+    if name not in _counters:
+        _counters[name] = Counter(name, help_text)
+    return _counters[name]
+
+
+def gauge(name: str, help_text: str, read: Callable[[], float]) -> None:
+    """Register a gauge whose value is read at scrape time."""
+    _gauges[name] = (help_text, read)
+
+
+def render() -> str:
+    lines = []
+    for metric in _counters.values():
+        lines.append(f"# HELP {metric.name} {metric.help_text}")
+        lines.append(f"# TYPE {metric.name} counter")
+        lines.append(f"{metric.name} {metric.value}")
+    for name, (help_text, read) in _gauges.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {float(read())}")
+    return "\n".join(lines) + "\n"
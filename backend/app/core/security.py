@@ -1,8 +1,14 @@
+import asyncio
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException, status
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from app.config import get_settings
-
+from app.core import metrics
+from app.core.cache import TTLCache
 
 settings = get_settings()
 # ── Password Hashing ───────────────────────────────────────────────────────
@@ -17,6 +23,64 @@ def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
 
+# ── Password hashing pool ──────────────────────────────────────────────────
+# bcrypt releases the GIL, so a thread pool spreads hashing across cores
+# while the event loop keeps serving other requests. Jobs beyond
+# workers + queue limit are rejected instead of piling up.
+_password_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers, thread_name_prefix="password-hash"
+)
+_password_pending = 0
+
+_password_jobs = metrics.counter(
+    "shop_password_hash_jobs_total", "Password hash/verify jobs completed"
+)
+_password_seconds = metrics.counter(
+    "shop_password_hash_seconds_total", "Time spent in password jobs, queue included"
+)
+_password_rejected = metrics.counter(
+    "shop_password_hash_rejected_total", "Password jobs rejected by the queue limit"
+)
+metrics.gauge(
+    "shop_password_hash_pending",
+    "Password jobs running or queued",
+    lambda: _password_pending,
+)
+
+
+async def _run_password_job(fn, *args):
+    global _password_pending
+    capacity = settings.password_hash_workers + settings.password_hash_queue_limit
+    if _password_pending >= capacity:
+        _password_rejected.inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado, inténtalo de nuevo en unos segundos",
+            headers={"Retry-After": "1"},
+        )
+    _password_pending += 1
+    started = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_password_executor, fn, *args)
+    finally:
+        _password_pending -= 1
+        _password_jobs.inc()
+        _password_seconds.inc(time.perf_counter() - started)
+
+
+async def hash_password_async(plain: str) -> str:
+    return await _run_password_job(hash_password, plain)
+
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await _run_password_job(verify_password, plain, hashed)
+
+
+def shutdown_password_pool() -> None:
+    _password_executor.shutdown(wait=False, cancel_futures=True)
+
+
 # ── JWT Tokens ─────────────────────────────────────────────────────────────
 def create_access_token(data: dict) -> str:
     expire = datetime.now(timezone.utc) + timedelta(
@@ -36,5 +100,37 @@ def create_refresh_token(data: dict) -> str:
     )
 
 
+# ── Verified token cache ───────────────────────────────────────────────────
+# sha256(token) -> claims, so a session's repeat requests skip the signature
+# check. An entry never outlives the token's own exp; invalid tokens are
+# never cached.
+_token_cache = TTLCache(
+    max_entries=settings.token_cache_max_entries,
+    ttl=settings.token_cache_max_ttl_seconds,
+)
+_token_cache_hits = metrics.counter(
+    "shop_token_cache_hits_total", "Decoded-token cache hits"
+)
+_token_cache_misses = metrics.counter(
+    "shop_token_cache_misses_total", "Decoded-token cache misses"
+)
+
+
 def decode_token(token: str) -> dict:
-    return jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+    if settings.token_cache_max_entries <= 0:
+        return jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+
+    key = hashlib.sha256(token.encode()).digest()
+    claims = _token_cache.get(key)
+    if claims is not None:
+        _token_cache_hits.inc()
+    else:
+        _token_cache_misses.inc()
+        claims = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+        ttl = min(
+            settings.token_cache_max_ttl_seconds,
+            claims.get("exp", 0) - time.time(),
+        )
+        if ttl > 0:
+            _token_cache.set(key, claims, ttl=ttl)
+    return dict(claims)
@@ -0,0 +1,88 @@
+import os
+import re
+from mimetypes import guess_type
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers, QueryParams
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+from starlette.types import Scope
+
+from app.config import get_settings
+
+settings = get_settings()
+
+# sha256 (content-addressed) or uuid4 hex names, optionally with a
+# _{variant} suffix: the bytes behind such a URL never change
+_IMMUTABLE_NAME = re.compile(r"^(?:[0-9a-f]{64}|[0-9a-f]{32})(?:_[a-z]+)?\.\w+$")
+
+# Pre-generated sidecar files, in order of preference
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _accepted_encodings(request_headers: Headers) -> set[str]:
+    accepted = set()
+    for item in request_headers.get("accept-encoding", "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00"):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles with cache headers suited to the catalog images:
+
+    - content-addressed names and ``?v=`` versioned URLs are served as
+      ``immutable`` with a one-year max-age, so revisits never revalidate;
+    - anything else is ``no-cache`` and revalidated through ETag/304;
+    - a pre-generated ``.br``/``.gz`` sidecar is served instead of the
+      file when the client accepts it.
+
+    Range requests and ``pathsend`` come from Starlette's FileResponse.
+    """
+
+    def cache_control(self, full_path: str, scope: Scope) -> str:
+        versioned = "v" in QueryParams(scope.get("query_string", b""))
+        if versioned or _IMMUTABLE_NAME.match(os.path.basename(full_path)):
+            return f"public, max-age={settings.static_max_age_seconds}, immutable"
+        return "public, no-cache"
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        headers = {"Cache-Control": self.cache_control(full_path, scope)}
+        media_type = guess_type(full_path)[0] or "text/plain"
+
+        path, encoding, has_sidecar = full_path, None, False
+        accepted = _accepted_encodings(request_headers)
+        for coding, suffix in _ENCODINGS:
+            try:
+                sidecar_stat = os.stat(full_path + suffix)
+            except OSError:
+                continue
+            has_sidecar = True
+            if coding in accepted and encoding is None:
+                path, stat_result, encoding = full_path + suffix, sidecar_stat, coding
+        if has_sidecar:
+            headers["Vary"] = "Accept-Encoding"
+        if encoding:
+            headers["Content-Encoding"] = encoding
+
+        response = FileResponse(
+            path,
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type,
+            stat_result=stat_result,
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,133 @@
+import math
+import time
+
+from fastapi import HTTPException, Request, status
+
+from app.config import get_settings
+from app.core import metrics
+from app.core.cache import TTLCache
+
+settings = get_settings()
+
+
+# ── Token bucket backends ──────────────────────────────────────────────────
+# take() spends one token from ``key`` and returns 0 when allowed, otherwise
+# the seconds until a token becomes available.
+class MemoryTokenBuckets:
+    """Per-process buckets; each worker enforces its own share of the limit."""
+
+    def __init__(self, max_keys: int):
+        self._buckets = TTLCache(max_entries=max_keys, ttl=60)
+
+    async def take(self, key: str, capacity: int, refill_per_second: float) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (float(capacity), now))
+        tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / refill_per_second
+        # Once refilled the bucket is indistinguishable from a missing one,
+        # so it only has to live until then
+        self._buckets.set(
+            key, (tokens, now), ttl=(capacity - tokens) / refill_per_second
+        )
+        return retry_after
+
+
+_REDIS_TAKE = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local retry = 0
+if tokens >= 1 then tokens = tokens - 1 else retry = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(retry)
+"""
+
+
+class RedisTokenBuckets:
+    """Buckets shared by every worker, updated atomically by a Lua script."""
+
+    def __init__(self, url: str, prefix: str = "shop:throttle"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError(
+                "login_throttle_backend=redis requiere el paquete 'redis'"
+            ) from exc
+        self._redis = redis.from_url(url)
+        self._take = self._redis.register_script(_REDIS_TAKE)
+        self._prefix = prefix
+
+    async def take(self, key: str, capacity: int, refill_per_second: float) -> float:
+        retry = await self._take(
+            keys=[f"{self._prefix}:{key}"],
+            args=[capacity, refill_per_second, time.time()],
+        )
+        return float(retry)
+
+
+class NullTokenBuckets:
+    async def take(self, key: str, capacity: int, refill_per_second: float) -> float:
+        return 0.0
+
+
+def _build_buckets():
+    if settings.login_throttle_backend == "redis":
+        return RedisTokenBuckets(settings.redis_url)
+    if settings.login_throttle_backend == "memory":
+        return MemoryTokenBuckets(max_keys=settings.login_throttle_max_keys)
+    return NullTokenBuckets()
+
+
+_buckets = _build_buckets()
+
+_throttled_ip = metrics.counter(
+    "shop_auth_throttled_ip_total", "Login/register attempts rejected per client IP"
+)
+_throttled_email = metrics.counter(
+    "shop_auth_throttled_email_total", "Login/register attempts rejected per email"
+)
+
+
+# ── Enforcement ────────────────────────────────────────────────────────────
+def _too_many_attempts(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Demasiados intentos, inténtalo más tarde",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+async def enforce_auth_throttle(request: Request, action: str, email: str) -> None:
+    """
+    Spend one token from the client IP bucket and one from the email bucket,
+    raising 429 when either is empty. Runs before any password hashing.
+    The client IP is the socket peer (run uvicorn with --proxy-headers
+    behind a reverse proxy).
+    """
+    client_ip = request.client.host if request.client else "unknown"
+    retry_after = await _buckets.take(
+        f"{action}:ip:{client_ip}",
+        settings.login_throttle_ip_capacity,
+        settings.login_throttle_ip_per_minute / 60,
+    )
+    if retry_after:
+        _throttled_ip.inc()
+        raise _too_many_attempts(retry_after)
+
+    retry_after = await _buckets.take(
+        f"{action}:email:{email.strip().lower()}",
+        settings.login_throttle_email_capacity,
+        settings.login_throttle_email_per_minute / 60,
+    )
+    if retry_after:
+        _throttled_email.inc()
+        raise _too_many_attempts(retry_after)
@@ -1,9 +1,20 @@
+import time
 from typing import AsyncGenerator
 
-from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from fastapi import Request, Response
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import DeclarativeBase, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    create_async_engine,
+    AsyncSession,
+    async_sessionmaker,
+)
 
 from app.config import get_settings
+from app.core import metrics
 
 settings = get_settings()
 
@@ -12,11 +23,150 @@ class Base(DeclarativeBase):
     pass
 
 
+# ── Connection pool ────────────────────────────────────────────────────────
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that counts checkouts, time spent waiting for a connection
+    (including opening an overflow one) and checkout timeouts. Subclasses
+    set ``stats_name`` to report another engine's pool.
+    """
+
+    stats_name = "shop_db_pool"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            metrics.counter(
+                f"{self.stats_name}_timeouts_total",
+                "Checkouts that gave up after DB_POOL_TIMEOUT",
+            ).inc()
+            raise
+        finally:
+            metrics.counter(
+                f"{self.stats_name}_checkouts_total", "Connections taken from the pool"
+            ).inc()
+            metrics.counter(
+                f"{self.stats_name}_wait_seconds_total",
+                "Time spent waiting for a pooled connection",
+            ).inc(time.perf_counter() - started)
+
+
+class ReadPool(InstrumentedPool):
+    stats_name = "shop_db_read_pool"
+
+
+class WriterPool(InstrumentedPool):
+    stats_name = "shop_db_writer_pool"
+
+
+def register_pool_gauges(engine: AsyncEngine, stats_name: str) -> None:
+    if not isinstance(engine.pool, InstrumentedPool):
+        return
+    # Read through engine.pool at scrape time: dispose() swaps the instance
+    gauges = (
+        ("size", "Configured pool size", lambda pool: pool.size()),
+        ("checked_out", "Connections in use", lambda pool: pool.checkedout()),
+        ("checked_in", "Idle connections in the pool", lambda pool: pool.checkedin()),
+        (
+            "overflow",
+            "Connections open beyond the pool size",
+            lambda pool: max(pool.overflow(), 0),
+        ),
+    )
+    for suffix, help_text, read in gauges:
+        metrics.gauge(
+            f"{stats_name}_{suffix}",
+            help_text,
+            lambda read=read: read(engine.pool),
+        )
+
+
+def engine_options(database_url: str, pool_class=InstrumentedPool) -> dict:
+    """create_async_engine keyword arguments for a database URL, from Settings."""
+    url = make_url(database_url)
+    options = {"echo": settings.db_echo, "pool_pre_ping": settings.db_pool_pre_ping}
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options  # in-memory SQLite keeps its single static connection
+    options.update(
+        poolclass=pool_class,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+    )
+    if url.get_driver_name() == "asyncpg":
+        # SQLAlchemy's prepared statement cache and asyncpg's own; both must
+        # be 0 behind PgBouncer in transaction mode
+        options["connect_args"] = {
+            "prepared_statement_cache_size": settings.db_statement_cache_size,
+            "statement_cache_size": settings.db_statement_cache_size,
+        }
+    return options
+
+
 engine = create_async_engine(
-    settings.database_url,
-    echo=settings.db_echo,
-    pool_pre_ping=True,
+    settings.database_url, **engine_options(settings.database_url)
 )
+register_pool_gauges(engine, InstrumentedPool.stats_name)
+
+
+# ── SQLite profile ─────────────────────────────────────────────────────────
+# WAL lets readers run while a write is in progress (the default rollback
+# journal blocks every reader for the length of each write), and the
+# pragmas below are per connection, so they are applied on connect.
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    if settings.sqlite_wal:
+        cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+    cursor.execute(f"PRAGMA mmap_size={settings.sqlite_mmap_size_mb * 1024 * 1024}")
+    # Negative cache_size is in KiB rather than pages
+    cursor.execute(f"PRAGMA cache_size={-settings.sqlite_cache_size_mb * 1024}")
+    cursor.close()
+
+
+class WriterRoutingSession(Session):
+    """
+    SQLite still allows a single writer at a time, and a transaction that
+    upgrades from reading to writing fails with "database is locked" instead
+    of waiting. So flushes and DML statements go through a dedicated
+    one-connection writer engine, which queues writes in-process, while
+    plain reads keep using the pooled connections.
+
+    Once a transaction has written, the rest of it stays on the writer so
+    it reads its own uncommitted changes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if (
+            self.info.get("writer")
+            or self._flushing
+            or getattr(clause, "is_dml", False)
+        ):
+            self.info["writer"] = True
+            return writer_engine.sync_engine
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+@event.listens_for(WriterRoutingSession, "after_transaction_end")
+def _release_writer(session, transaction) -> None:
+    if transaction.parent is None:
+        session.info.pop("writer", None)
+
+
+_url = make_url(settings.database_url)
+writer_engine = engine
+if _url.get_backend_name() == "sqlite":
+    event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    if settings.sqlite_single_writer and _url.database not in (None, "", ":memory:"):
+        _writer_options = engine_options(settings.database_url, pool_class=WriterPool)
+        _writer_options.update(pool_size=1, max_overflow=0)
+        writer_engine = create_async_engine(settings.database_url, **_writer_options)
+        event.listen(writer_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+        register_pool_gauges(writer_engine, WriterPool.stats_name)
 
 
 AsyncSessionLocal = async_sessionmaker(
@@ -25,9 +175,66 @@ AsyncSessionLocal = async_sessionmaker(
     bind=engine,
     class_=AsyncSession,
     expire_on_commit=False,
+    sync_session_class=WriterRoutingSession if writer_engine is not engine else Session,
 )
 
 
+# ── Read replica ───────────────────────────────────────────────────────────
+# Without DATABASE_READ_URL every read goes to the primary as before
+if settings.database_read_url:
+    read_engine = create_async_engine(
+        settings.database_read_url,
+        **engine_options(settings.database_read_url, pool_class=ReadPool),
+    )
+    register_pool_gauges(read_engine, ReadPool.stats_name)
+    ReadSessionLocal = async_sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        bind=read_engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+    )
+else:
+    read_engine = engine
+    ReadSessionLocal = AsyncSessionLocal
+
+READ_PRIMARY_COOKIE = "read_primary"
+
+
+def mark_read_primary(response: Response) -> None:
+    """Send this client's reads to the primary until the replica caught up."""
+    response.set_cookie(
+        READ_PRIMARY_COOKIE,
+        "1",
+        httponly=True,
+        secure=settings.cookie_secure,
+        samesite="lax",
+        max_age=max(1, round(settings.read_your_writes_seconds)),
+    )
+
+
+async def dispose_engines() -> None:
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
+    if writer_engine is not engine:
+        await writer_engine.dispose()
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         yield session
+
+
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Session for read-only endpoints: the replica, or the primary for a
+    client that wrote in the last ``read_your_writes_seconds``.
+    """
+    sessionmaker = (
+        AsyncSessionLocal
+        if request.cookies.get(READ_PRIMARY_COOKIE)
+        else ReadSessionLocal
+    )
+    async with sessionmaker() as session:
+        yield session
@@ -15,6 +15,8 @@ from sqlalchemy import (
     Numeric,
     CheckConstraint,
     Index,
+    JSON,
+    event,
 )
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -33,6 +35,26 @@ product_categories_table = Table(
 )
 
 
+# ── Category hierarchy closure table ─────────────────────────────────────────────────────────────────
+# One row per (ancestor, descendant) pair, including (c, c, 0) for every
+# category, so "everything under X" at any depth is a single indexed lookup.
+# Maintained by CategoryService.
+category_closure_table = Table(
+    "category_closure",
+    Base.metadata,
+    Column(
+        "ancestor_id", ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True
+    ),
+    Column(
+        "descendant_id",
+        ForeignKey("categories.id", ondelete="CASCADE"),
+        primary_key=True,
+        index=True,
+    ),
+    Column("depth", Integer, nullable=False),
+)
+
+
 # ── Category  ────────────────────────────────────────────────────────────────────────────────────────────
 class Category(Base):
     __tablename__ = "categories"
@@ -91,6 +113,12 @@ class Product(Base):
     )
     discount_end_date = Column(DateTime, nullable=True)
 
+    # Post-discount price, materialized from current_price on every flush
+    # (see _sync_effective_price) so range filters and price sorting run on
+    # an index instead of in Python. No default: an INSERT that bypasses the
+    # ORM and forgets it fails instead of storing a free product
+    effective_price = Column(Numeric(precision=10, scale=2), nullable=False, index=True)
+
     # Relationships
     categories = relationship(
         "Category",
@@ -118,15 +146,31 @@ class Product(Base):
         ),
         # Composite index for common query patterns
         Index("ix_product_active_discount", "is_active", "has_discount"),
+        Index("ix_product_active_effective_price", "is_active", "effective_price"),
+        # Upcoming end dates, read in order by the discount expiry timer
+        Index("ix_product_discount_expiry", "has_discount", "discount_end_date"),
     )
 
+    @property
+    def discount_expired(self) -> bool:
+        if not self.discount_end_date:
+            return False
+        end_date = self.discount_end_date
+        if end_date.tzinfo is not None:
+            end_date = end_date.astimezone(timezone.utc).replace(tzinfo=None)
+        return end_date <= datetime.now(timezone.utc).replace(tzinfo=None)
+
     @property
     def current_price(self) -> Decimal:
         """
         Calculate the effective price after discount.
         Centralized business logic to prevent frontend/backend drift.
         """
-        if self.has_discount and self.discount_percentage > 0:
+        if (
+            self.has_discount
+            and self.discount_percentage > 0
+            and not self.discount_expired
+        ):
             discount_multiplier = (Decimal("100") - self.discount_percentage) / Decimal(
                 "100"
             )
@@ -137,6 +181,20 @@ class Product(Base):
         return f"<​Product(id={self.id}, name={self.name}, price={self.price})>"
 
 
+@event.listens_for(Product, "before_insert")
+@event.listens_for(Product, "before_update")
+def _sync_effective_price(mapper, connection, product: Product) -> None:
+    """Store the post-discount price so it can be filtered and sorted in SQL."""
+    # Column defaults only apply at INSERT time, after this hook
+    if product.price is None:
+        product.price = Decimal("0.00")
+    # Incoming discounts are floats; keep the arithmetic in Decimal
+    if not isinstance(product.discount_percentage, Decimal):
+        product.discount_percentage = Decimal(str(product.discount_percentage or 0))
+    if product.effective_price != product.current_price:
+        product.effective_price = product.current_price
+
+
 # ── Product Images Routes ──────────────────────────────────────────────────────────────────────────────────────────
 class ProductImage(Base):
     __tablename__ = "product_images"
@@ -148,8 +206,12 @@ class ProductImage(Base):
         nullable=False,
         index=True,  # Index for JOIN performance
     )
-    image_url = Column(String(512), nullable=False)  # Explicit length for URLs
+    # Content-addressed and shared between rows; indexed for reference counts
+    image_url = Column(String(512), nullable=False, index=True)
     is_main = Column(Boolean, default=False, nullable=False)
+    # {"thumbnail"|"card"|"detail": {"webp"|"avif": url}}; NULL until generated
+    variants = Column(JSON(none_as_null=True), nullable=True)
+    placeholder = Column(Text, nullable=True)  # tiny blurred WebP as a data URI
 
     # Relationship
     product = relationship("Product", back_populates="images")
@@ -161,6 +223,7 @@ class ProductImage(Base):
             "product_id",
             unique=True,
             postgresql_where=(Column("is_main") == True),
+            sqlite_where=(Column("is_main") == True),
         ),
     )
 
@@ -188,3 +251,17 @@ class User(Base):
         DateTime, nullable=False, default=lambda: datetime.now(timezone.utc)
     )
     loyalty_points = Column(Integer, nullable=False, default=0)
+
+
+# ── Scheduled job runs ────────────────────────────────────────────────────────────────────────────────────────────
+class JobRun(Base):
+    __tablename__ = "job_runs"
+    id = Column(Integer, Identity(always=False), primary_key=True)
+    job_name = Column(String(100), nullable=False)
+    worker = Column(String(255), nullable=False)  # host:pid of the leader
+    started_at = Column(DateTime, nullable=False)
+    duration_ms = Column(Integer, nullable=False)
+    succeeded = Column(Boolean, nullable=False)
+    error = Column(Text, nullable=True)
+
+    __table_args__ = (Index("ix_job_run_name_started", "job_name", "started_at"),)
@@ -1,25 +1,27 @@
-import os
-from uuid import uuid4
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from starlette.concurrency import run_in_threadpool
 from app import schemas
 from app.models import Category
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.config import get_settings
+from app.core.cache import invalidate_catalog
+from app.core.dependencies import UploadLimit, UploadRoute
+from app.services.image_storage import release_image_files, save_image_upload
 from app.services.category_service import CategoryService
+from app.services.category_snapshot import load_category_snapshot
 
 router = APIRouter(
     prefix="/categories",
     tags=["categories"],
+    route_class=UploadRoute,
 )
 
 
 # ── Get all categories ──────────────────────────────────────────────────────
 @router.get("", response_model=List[schemas.Category])
-async def get_categories(db: AsyncSession = Depends(get_db)):
+async def get_categories(db: AsyncSession = Depends(get_read_db)):
     return await CategoryService.get_all(db)
 
 
@@ -52,7 +54,11 @@ async def delete_category(
 
 
 # ── Upload category image ───────────────────────────────────────────────────
-@router.post("/{category_id}/image", response_model=schemas.Category)
+@router.post(
+    "/{category_id}/image",
+    response_model=schemas.Category,
+    dependencies=[Depends(UploadLimit())],
+)
 async def upload_category_image(
     category_id: int,
     image_file: UploadFile = File(...),
@@ -63,37 +69,17 @@ async def upload_category_image(
     category = result.scalar_one_or_none()
     if not category:
         raise HTTPException(status_code=404, detail="Categoría no encontrada")
-    if image_file.content_type not in settings.allowed_image_types:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Extensión no permitida. Usa png, jpeg, webp",
-        )
-    file_bytes = await image_file.read()
-    max_bytes = settings.max_image_size_mb * 1024 * 1024
-    if len(file_bytes) > max_bytes:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Imagen demasiado grande. Máximo {settings.max_image_size_mb}MB",
-        )
-    # Delete old image file from disk if one exists
-    if category.image_url:
-        old_relative = category.image_url.lstrip("/")
-        old_path = os.path.join(
-            settings.static_dir, old_relative.removeprefix("static/")
-        )
-        if os.path.exists(old_path):
-            await run_in_threadpool(os.remove, old_path)
-    file_ext = os.path.splitext(image_file.filename)[1]
-    unique_filename = f"{uuid4().hex}{file_ext}"
-    file_path = os.path.join(settings.category_images_dir, unique_filename)
-
-    def write_file() -> None:
-        with open(file_path, "wb") as f:
-            f.write(file_bytes)
-
-    await run_in_threadpool(write_file)
-    category.image_url = f"/{settings.category_images_dir}/{unique_filename}"
+    unique_filename = await save_image_upload(
+        image_file, settings.categories_images_dir
+    )
+    old_image_url = category.image_url
+    category.image_url = f"/{settings.categories_images_dir}/{unique_filename}"
     await db.commit()
+    await invalidate_catalog()
+    await load_category_snapshot(db)
+    # Old file goes only once the new URL is committed, if nothing else uses it
+    if old_image_url:
+        await release_image_files(db, [old_image_url])
     await db.refresh(category)
     return category
 
@@ -104,17 +90,16 @@ async def delete_category_image(
     category_id: int,
     db: AsyncSession = Depends(get_db),
 ):
-    settings = get_settings()
     result = await db.execute(select(Category).where(Category.id == category_id))
     category = result.scalar_one_or_none()
     if not category:
         raise HTTPException(status_code=404, detail="Categoría no encontrada")
     if not category.image_url:
         raise HTTPException(status_code=404, detail="Esta categoría no tiene imagen")
-    relative = category.image_url.lstrip("/")
-    file_path = os.path.join(settings.static_dir, relative.removeprefix("static/"))
-    if os.path.exists(file_path):
-        await run_in_threadpool(os.remove, file_path)
+    image_url = category.image_url
     category.image_url = None
     await db.commit()
+    await invalidate_catalog()
+    await load_category_snapshot(db)
+    await release_image_files(db, [image_url])
     return None
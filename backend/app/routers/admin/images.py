@@ -1,21 +1,29 @@
-import os
-from uuid import uuid4
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+import asyncio
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update
 from app import models, schemas
 from app.database import get_db
 from app.config import get_settings
-from starlette.concurrency import run_in_threadpool
+from app.core.cache import invalidate_catalog
+from app.core.dependencies import UploadLimit, UploadRoute
+from app.services.image_storage import release_image_files, save_image_upload
+from app.services.image_variants import generate_variants
 
 router = APIRouter(
     prefix="/products",
     tags=["images"],
+    route_class=UploadRoute,
 )
 
 
 # añadir una imagen
-@router.post("/{product_id}/images", response_model=schemas.ProductImageRead)
+@router.post(
+    "/{product_id}/images",
+    response_model=schemas.ProductImageRead,
+    dependencies=[Depends(UploadLimit())],
+)
 async def upload_product_image(
     product_id: int,
     image_file: UploadFile = File(...),
@@ -32,30 +40,13 @@ async def upload_product_image(
     if product is None:
         raise HTTPException(status_code=404, detail="Producto no encontrado.")
 
-    if image_file.content_type not in settings.allowed_image_types:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="La extensión del archivo no esta permitida. Usa png, jpeg, webp",
-        )
-
-    file_extension = os.path.splitext(image_file.filename)[1]
-    unique_filename = f"{uuid4().hex}{file_extension}"
-    file_path = os.path.join(settings.product_images_dir, unique_filename)
-    file_bytes = await image_file.read()
-    max_bytes = settings.max_image_size_mb * 1024 * 1024
-    if len(file_bytes) > max_bytes:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Imagen demasiado grande. Máximo {settings.max_image_size_mb}MB",
-        )
-
-    def write_file() -> None:
-        with open(file_path, "wb") as file_object:
-            file_object.write(file_bytes)
-
-    await run_in_threadpool(write_file)
-
+    unique_filename = await save_image_upload(image_file, settings.product_images_dir)
     image_url = f"/{settings.product_images_dir}/{unique_filename}"
+    try:
+        variants, placeholder = await generate_variants(image_url)
+    except HTTPException:
+        await release_image_files(database_session, [image_url])
+        raise
 
     # Si es main, quitar main a las otras
     if is_main:
@@ -70,21 +61,118 @@ async def upload_product_image(
         product_id=product_id,
         image_url=image_url,
         is_main=is_main,
+        variants=variants,
+        placeholder=placeholder,
     )
 
     database_session.add(product_image)
     await database_session.commit()
+    await invalidate_catalog()
     await database_session.refresh(product_image)
 
     return product_image
 
 
+# añadir varias imágenes (galería) en una sola petición
+@router.post(
+    "/{product_id}/images/batch",
+    response_model=List[schemas.ProductImageRead],
+    dependencies=[Depends(UploadLimit(batch=True))],
+)
+async def upload_product_images(
+    product_id: int,
+    image_files: List[UploadFile] = File(...),
+    main_index: Optional[int] = Query(
+        None, ge=0, description="Posición de la imagen principal dentro del lote"
+    ),
+    database_session: AsyncSession = Depends(get_db),
+):
+    settings = get_settings()
+    if len(image_files) > settings.max_batch_images:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo {settings.max_batch_images} imágenes por petición",
+        )
+    if main_index is not None and main_index >= len(image_files):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="main_index no corresponde a ninguna imagen del lote",
+        )
+
+    product_found = await database_session.scalar(
+        select(models.Product.id).where(models.Product.id == product_id)
+    )
+    if product_found is None:
+        raise HTTPException(status_code=404, detail="Producto no encontrado.")
+
+    # Validate, write and render every file concurrently; if any of them
+    # fails, release whatever the others wrote and report the first error
+    saved = await asyncio.gather(
+        *(save_image_upload(f, settings.product_images_dir) for f in image_files),
+        return_exceptions=True,
+    )
+    image_urls = [
+        f"/{settings.product_images_dir}/{filename}"
+        for filename in saved
+        if isinstance(filename, str)
+    ]
+    errors = [result for result in saved if isinstance(result, BaseException)]
+    rendered = []
+    if not errors:
+        # Identical files in one batch share a URL; render each one once
+        unique_urls = list(dict.fromkeys(image_urls))
+        results = await asyncio.gather(
+            *(generate_variants(url) for url in unique_urls), return_exceptions=True
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        rendered_by_url = dict(zip(unique_urls, results))
+        rendered = [rendered_by_url[url] for url in image_urls]
+    if errors:
+        await release_image_files(database_session, image_urls)
+        raise errors[0]
+
+    # Without an explicit choice, a product with no main image gets the first one
+    if main_index is None:
+        has_main = await database_session.scalar(
+            select(models.ProductImage.id)
+            .where(
+                models.ProductImage.product_id == product_id,
+                models.ProductImage.is_main == True,
+            )
+            .limit(1)
+        )
+        main_index = None if has_main else 0
+    else:
+        await database_session.execute(
+            update(models.ProductImage)
+            .where(models.ProductImage.product_id == product_id)
+            .values(is_main=False)
+        )
+
+    product_images = [
+        models.ProductImage(
+            product_id=product_id,
+            image_url=image_url,
+            is_main=position == main_index,
+            variants=variants,
+            placeholder=placeholder,
+        )
+        for position, (image_url, (variants, placeholder)) in enumerate(
+            zip(image_urls, rendered)
+        )
+    ]
+    database_session.add_all(product_images)
+    await database_session.commit()
+    await invalidate_catalog()
+
+    return product_images
+
+
 # borrar imagen
 @router.delete("/images/{image_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_product_image(
     image_id: int, database_session: AsyncSession = Depends(get_db)
 ):
-    settings = get_settings()
     query = select(models.ProductImage).where(models.ProductImage.id == image_id)
     result = await database_session.execute(query)
     image = result.scalar_one_or_none()
@@ -92,14 +180,12 @@ async def delete_product_image(
     if not image:
         raise HTTPException(status_code=404, detail="Imagen no encontrada")
 
-    # En delete_product_image (la ruta sin product_id):
-    relative_path = image.image_url.removeprefix("/static/").lstrip("/")
-    file_path = os.path.join(settings.static_dir, relative_path)
-    if os.path.exists(file_path):
-        await run_in_threadpool(os.remove, file_path)
-
+    image_url = image.image_url
     await database_session.delete(image)
     await database_session.commit()
+    await invalidate_catalog()
+    # The file may be shared with other images; only the last one removes it
+    await release_image_files(database_session, [image_url])
 
     return None
 
@@ -111,7 +197,6 @@ async def delete_single_product_image(
     product_id: int, image_id: int, database_session: AsyncSession = Depends(get_db)
 ):
 
-    settings = get_settings()
     query = select(models.ProductImage).where(
         models.ProductImage.id == image_id,
         models.ProductImage.product_id == product_id,  # Validación adicional
@@ -124,12 +209,7 @@ async def delete_single_product_image(
         raise HTTPException(status_code=404, detail="Imagen no encontrada")
 
     was_main = bool(image.is_main)
-
     image_url = image.image_url
-    relative_path = image_url.replace("/static/", "", 1).lstrip("/")
-    file_path = os.path.join(settings.static_dir, relative_path)
-    if os.path.exists(file_path):
-        await run_in_threadpool(os.remove, file_path)
 
     await database_session.delete(image)
     await database_session.commit()
@@ -148,4 +228,7 @@ async def delete_single_product_image(
             new_main_image.is_main = True
             await database_session.commit()
 
+    await invalidate_catalog()
+    await release_image_files(database_session, [image_url])
+
     return None
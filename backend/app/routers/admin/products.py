@@ -1,12 +1,10 @@
 from typing import Optional
 from fastapi import APIRouter, Depends, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.config import get_settings
 from app import schemas
-from app.database import get_db
-import os
+from app.database import get_db, get_read_db
 from app.services.product_service import ProductService
-from starlette.concurrency import run_in_threadpool
+from app.services.image_storage import release_image_files
 
 router = APIRouter(
     prefix="/products",
@@ -18,7 +16,9 @@ router = APIRouter(
 # LEER LOS PRODUCTOS
 @router.get("", response_model=schemas.ProductListResponse)
 async def get_products(
-    q: Optional[str] = Query(default=None, description="Buscar en nombre del producto"),
+    q: Optional[str] = Query(
+        default=None, description="Buscar en nombre y descripción del producto"
+    ),
     bar_code: Optional[str] = Query(
         default=None, description="Código de barras exacto"
     ),
@@ -27,6 +27,12 @@ async def get_products(
     ),
     stock: Optional[int] = Query(default=None, ge=0, description="Stock exacto"),
     price: Optional[float] = Query(default=None, ge=0, description="Precio exacto"),
+    min_price: Optional[float] = Query(
+        default=None, ge=0, description="Precio final mínimo (con descuento)"
+    ),
+    max_price: Optional[float] = Query(
+        default=None, ge=0, description="Precio final máximo (con descuento)"
+    ),
     category_id: Optional[int] = Query(
         default=None, ge=1, description="Filtrar por categoría"
     ),
@@ -37,7 +43,11 @@ async def get_products(
     has_discount: Optional[bool] = Query(
         default=None, description="Filtrar por productos descontados (null = todos)"
     ),
-    db: AsyncSession = Depends(get_db),
+    cursor: Optional[str] = Query(
+        default=None,
+        description="Cursor opaco (next_cursor) para paginación keyset; ignora page",
+    ),
+    db: AsyncSession = Depends(get_read_db),
 ):
 
     return await ProductService.get_products(
@@ -49,8 +59,11 @@ async def get_products(
         is_active=is_active,
         stock=stock,
         price=price,
+        min_price=min_price,
+        max_price=max_price,
         category_id=category_id,
         has_discount=has_discount,
+        cursor=cursor,
     )
 
 
@@ -82,16 +95,10 @@ async def delete_product(
     product_id: int,
     db: AsyncSession = Depends(get_db),
 ):
-    config = get_settings()
     files_to_remove = await ProductService.delete(db, product_id)
 
-    # Borrar archivos físicos
-    for url in files_to_remove:
-        file_path = os.path.join(
-            config.static_dir, url.removeprefix("/static/").lstrip("/")
-        )
-        if os.path.exists(file_path):
-            await run_in_threadpool(os.remove, file_path)
+    # Borrar archivos físicos que ya no use ninguna otra imagen
+    await release_image_files(db, files_to_remove)
 
     return {"message": "El producto fue eliminado correctamente"}
 
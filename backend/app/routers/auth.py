@@ -1,12 +1,20 @@
-from fastapi import APIRouter, Depends, Response, Cookie, HTTPException, status
+from fastapi import (
+    APIRouter,
+    Cookie,
+    Depends,
+    HTTPException,
+    Request,
+    Response,
+    status,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 from app.database import get_db
 from app.schemas import UserCreate, UserRead, LoginRequest, TokenResponse
 from app.services.auth_service import register_user, authenticate_user
 from app.core.security import create_access_token, create_refresh_token, decode_token
 from jose import JWTError
-from app.core.dependencies import get_current_user
+from app.core.dependencies import get_current_user, load_principal
+from app.core.throttle import enforce_auth_throttle
 from app.models import User
 from app.config import get_settings
 
@@ -37,8 +45,12 @@ def set_auth_cookies(response: Response, access_token: str, refresh_token: str)
 # ── Register ───────────────────────────────────────────────────────────────
 @router.post("/register", response_model=UserRead, status_code=201)
 async def register(
-    data: UserCreate, response: Response, db: AsyncSession = Depends(get_db)
+    request: Request,
+    data: UserCreate,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
 ):
+    await enforce_auth_throttle(request, "register", data.email)
     user = await register_user(db, data)
     access_token = create_access_token({"sub": str(user.id)})
     refresh_token = create_refresh_token({"sub": str(user.id)})
@@ -49,8 +61,12 @@ async def register(
 # ── Login ──────────────────────────────────────────────────────────────────
 @router.post("/login", response_model=UserRead)
 async def login(
-    data: LoginRequest, response: Response, db: AsyncSession = Depends(get_db)
+    request: Request,
+    data: LoginRequest,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
 ):
+    await enforce_auth_throttle(request, "login", data.email)
     user = await authenticate_user(db, data.email, data.password)
     access_token = create_access_token({"sub": str(user.id)})
     refresh_token = create_refresh_token({"sub": str(user.id)})
@@ -100,12 +116,11 @@ async def refresh(
         raise credentials_exception
 
     # ── Re-validate user is still active ──────────────────────────────────
-    result = await db.execute(select(User).where(User.id == user_pk))
-    user = result.scalar_one_or_none()
-    if user is None or not user.is_active:
+    principal = await load_principal(db, user_pk)
+    if principal is None or not principal.is_active:
         raise credentials_exception
 
-    access_token = create_access_token({"sub": str(user.id)})
+    access_token = create_access_token({"sub": str(principal.id)})
     response.set_cookie(
         "access_token",
         access_token,
@@ -0,0 +1,30 @@
+import secrets
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+from app.config import get_settings
+from app.core import metrics
+
+settings = get_settings()
+
+
+# ── Scraper authentication ─────────────────────────────────────────────────
+async def require_metrics_token(request: Request) -> None:
+    if settings.metrics_token is None:
+        return  # only reachable from where the deployment exposes it
+    expected = f"Bearer {settings.metrics_token}"
+    provided = request.headers.get("authorization", "")
+    if not secrets.compare_digest(provided.encode(), expected.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Error en autorización"
+        )
+
+
+# ── Router ─────────────────────────────────────────────────────────────────
+router = APIRouter(dependencies=[Depends(require_metrics_token)])
+
+
+# ── Prometheus scrape endpoint ─────────────────────────────────────────────
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    return metrics.render()
@@ -1,27 +1,97 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
+import hashlib
+from typing import Awaitable, Callable
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response
+from pydantic import TypeAdapter
 from app.services.product_service import ProductService
 from app.services.category_service import CategoryService
+from app.services.category_snapshot import get_category_snapshot
 from app import schemas
-from app.database import get_db
-from typing import Optional, Literal
+from app.database import READ_PRIMARY_COOKIE, get_read_db
+from app.config import get_settings
+from app.core.cache import cache_key, catalog_version, response_cache
+from typing import Optional, Literal, Union
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.models import Product
 from sqlalchemy.orm import selectinload
 
+settings = get_settings()
+
 # ── Router ─────────────────────────────────────────────────────────────────
 router = APIRouter()
 
+_category_tree_adapter = TypeAdapter(list[schemas.CategoryTree])
+_category_list_adapter = TypeAdapter(list[schemas.Category])
+
+
+# ── Cached JSON helper ─────────────────────────────────────────────────────
+# Responses are cached already serialized, so a hit skips both the database
+# and pydantic; response_model stays on each route for the OpenAPI schema.
+# The strong ETag is derived from the catalog version, so a matching
+# If-None-Match is answered with 304 before anything is loaded or rendered.
+# Only a version shared by every worker (the Redis backend) can back an
+# ETag: a per-process one would keep answering 304 on the workers that did
+# not see a write, with no TTL to end it.
+def _if_none_match(request: Request) -> list[str]:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return []
+    return [tag.strip().removeprefix("W/") for tag in header.split(",")]
+
+
+async def _cached_json(
+    request: Request, key: str, render: Callable[[], Awaitable[bytes]]
+) -> Response:
+    if request.cookies.get(READ_PRIMARY_COOKIE):
+        # This client just wrote and reads from the primary (get_read_db),
+        # but a cached body may have been rendered from the lagging replica:
+        # bypass the cache both ways so each path stays on one source
+        return Response(
+            content=await render(),
+            media_type="application/json",
+            headers={"Cache-Control": "private, no-cache"},
+        )
+    version = await catalog_version()
+    headers = {"Cache-Control": "public, no-cache"}
+    candidates = _if_none_match(request) if response_cache.shared else []
+    if response_cache.shared:
+        digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+        headers["ETag"] = f'"{version}-{digest}"'
+        if headers["ETag"] in candidates:
+            return Response(status_code=304, headers=headers)
+
+    versioned_key = f"{version}:{key}"
+    body = await response_cache.get(versioned_key)
+    if body is None:
+        body = await render()  # raises 404 for a missing resource
+        await response_cache.set(versioned_key, body)
+    # "*" matches any current representation, so only once one exists
+    if "*" in candidates:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 
 # ── Get public product listing ─────────────────────────────────────────────
-@router.get("/products", response_model=schemas.ProductListResponse)
+@router.get(
+    "/products",
+    response_model=Union[schemas.ProductListResponse, schemas.ProductCardListResponse],
+)
 async def get_public_products(
-    q: Optional[str] = Query(default=None, description="Buscar en nombre del producto"),
+    request: Request,
+    q: Optional[str] = Query(
+        default=None, description="Buscar en nombre y descripción del producto"
+    ),
     bar_code: Optional[str] = Query(
         default=None, description="Código de barras exacto"
     ),
     stock: Optional[int] = Query(default=None, ge=0, description="Stock exacto"),
     price: Optional[float] = Query(default=None, ge=0, description="Precio exacto"),
+    min_price: Optional[float] = Query(
+        default=None, ge=0, description="Precio final mínimo (con descuento)"
+    ),
+    max_price: Optional[float] = Query(
+        default=None, ge=0, description="Precio final máximo (con descuento)"
+    ),
     category_id: Optional[int] = Query(
         default=None, ge=1, description="Filtrar por categoría"
     ),
@@ -35,53 +105,145 @@ async def get_public_products(
     has_discount: Optional[bool] = Query(
         default=None, description="Filtrar por productos descontados (null = todos)"
     ),
-    sort: Optional[Literal["popular", "price_asc", "price_desc"]] = Query(
+    cursor: Optional[str] = Query(
+        default=None,
+        description="Cursor opaco (next_cursor) para paginación keyset; ignora page",
+    ),
+    sort: Optional[Literal["popular", "price_asc", "price_desc", "relevance"]] = Query(
         default="popular", description="Ordenar resultados"
     ),
-    db: AsyncSession = Depends(get_db),
-) -> schemas.ProductListResponse:
-    return await ProductService.get_products(
-        db=db,
+    view: Literal["full", "card"] = Query(
+        default="full", description="card = proyección compacta para listados"
+    ),
+    db: AsyncSession = Depends(get_read_db),
+):
+    response_schema = (
+        schemas.ProductCardListResponse
+        if view == "card"
+        else schemas.ProductListResponse
+    )
+    filters = dict(
         page=page,
         page_size=page_size,
         q=q,
         bar_code=bar_code,
-        is_active=True,
         stock=stock,
         price=price,
+        min_price=min_price,
+        max_price=max_price,
         category_id=category_id,
         super_category_id=super_category_id,
         has_discount=has_discount,
         sort=sort,
+        cursor=cursor,
+        view=view,
     )
 
+    async def render() -> bytes:
+        result = await ProductService.get_products(
+            db=db,
+            is_active=True,
+            total_mode=settings.storefront_total_mode,
+            **filters,
+        )
+        return response_schema.model_validate(result).model_dump_json().encode()
+
+    return await _cached_json(request, cache_key("products", **filters), render)
+
+
+# ── Get facet counts for the current filters ────────────────────────────────
+# Declared before /products/{id} so "facets" is not parsed as a product id
+@router.get("/products/facets", response_model=schemas.ProductFacetsResponse)
+async def get_product_facets(
+    request: Request,
+    q: Optional[str] = Query(
+        default=None, description="Buscar en nombre y descripción del producto"
+    ),
+    price: Optional[float] = Query(default=None, ge=0, description="Precio exacto"),
+    min_price: Optional[float] = Query(
+        default=None, ge=0, description="Precio final mínimo (con descuento)"
+    ),
+    max_price: Optional[float] = Query(
+        default=None, ge=0, description="Precio final máximo (con descuento)"
+    ),
+    category_id: Optional[int] = Query(
+        default=None, ge=1, description="Filtrar por categoría"
+    ),
+    super_category_id: Optional[int] = Query(
+        default=None, ge=1, description="Filtrar por super categoría"
+    ),
+    has_discount: Optional[bool] = Query(
+        default=None, description="Filtrar por productos descontados (null = todos)"
+    ),
+    db: AsyncSession = Depends(get_read_db),
+):
+    filters = dict(
+        q=q,
+        price=price,
+        min_price=min_price,
+        max_price=max_price,
+        category_id=category_id,
+        super_category_id=super_category_id,
+        has_discount=has_discount,
+    )
+
+    async def render() -> bytes:
+        facets = await ProductService.get_facets(db=db, is_active=True, **filters)
+        return (
+            schemas.ProductFacetsResponse.model_validate(facets)
+            .model_dump_json()
+            .encode()
+        )
+
+    return await _cached_json(request, cache_key("facets", **filters), render)
+
 
 # ── Get category tree (super cats + children) ───────────────────────────────
 @router.get("/categories/tree", response_model=list[schemas.CategoryTree])
-async def get_categories_tree(db: AsyncSession = Depends(get_db)):
-    return await CategoryService.get_category_tree(db)
+async def get_categories_tree(
+    request: Request, db: AsyncSession = Depends(get_read_db)
+):
+    async def render() -> bytes:
+        tree = await CategoryService.get_category_tree(db)
+        return _category_tree_adapter.dump_json(
+            _category_tree_adapter.validate_python(tree)
+        )
+
+    return await _cached_json(request, cache_key("categories_tree"), render)
 
 
 # ── Get public categories listing ───────────────────────────────────────────
-@router.get("/categories")
-async def get_categories(db: AsyncSession = Depends(get_db)):
-    return await CategoryService.get_all(db)
+@router.get("/categories", response_model=list[schemas.Category])
+async def get_categories(request: Request, db: AsyncSession = Depends(get_read_db)):
+    async def render() -> bytes:
+        snapshot = await get_category_snapshot(db)
+        categories = snapshot.categories
+        return _category_list_adapter.dump_json(
+            _category_list_adapter.validate_python(categories)
+        )
+
+    return await _cached_json(request, cache_key("categories"), render)
 
 
 # ── Get a specific product publicaly ────────────────────────────────────────
 @router.get("/products/{id}", response_model=schemas.ProductRead)
-async def get_product_publicaly(id: int, db: AsyncSession = Depends(get_db)):
-    query = (
-        select(Product)
-        .options(
-            selectinload(Product.categories),
-            selectinload(Product.images),
+async def get_product_publicaly(
+    id: int, request: Request, db: AsyncSession = Depends(get_read_db)
+):
+    async def render() -> bytes:
+        query = (
+            select(Product)
+            .options(
+                selectinload(Product.categories),
+                selectinload(Product.images),
+            )
+            .where(Product.id == id)
         )
-        .where(Product.id == id)
-    )
-    result = await db.execute(query)
-    product = result.scalar_one_or_none()
+        result = await db.execute(query)
+        product = result.scalar_one_or_none()
+
+        if not product or not product.is_active:
+            raise HTTPException(status_code=404, detail="Producto no encontrado")
+        return schemas.ProductRead.model_validate(product).model_dump_json().encode()
 
-    if not product or not product.is_active:
-        raise HTTPException(status_code=404, detail="Producto no encontrado")
-    return product
+    return await _cached_json(request, cache_key("product", id=id), render)
@@ -1,10 +1,88 @@
-from datetime import datetime, timezone
-from sqlalchemy import update
+import asyncio
+import functools
+import heapq
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, select, update
+from app.config import get_settings
+from app.core import metrics
+from app.core.leader import WORKER_ID
 from app.database import AsyncSessionLocal
-from app.models import Product
+from app.core.cache import invalidate_catalog
+from app.models import JobRun, Product
+from app.services.image_gc import collect_orphan_images
 
+settings = get_settings()
+logger = logging.getLogger(__name__)
 
-async def deactivate_expired_discounts():
+_discounts_expired = metrics.counter(
+    "shop_discounts_expired_total", "Product discounts switched off at their end date"
+)
+_job_runs = metrics.counter("shop_job_runs_total", "Scheduled job runs")
+_job_failures = metrics.counter(
+    "shop_job_failures_total", "Scheduled job runs that failed"
+)
+
+
+# ── Job run history ────────────────────────────────────────────────────────
+async def _record_run(
+    job_name: str, started_at: datetime, duration: float, error: str | None
+) -> None:
+    try:
+        async with AsyncSessionLocal() as db:
+            db.add(
+                JobRun(
+                    job_name=job_name,
+                    worker=WORKER_ID,
+                    started_at=started_at,
+                    duration_ms=round(duration * 1000),
+                    succeeded=error is None,
+                    error=error,
+                )
+            )
+            await db.commit()
+    except Exception:
+        # Bookkeeping must never fail the job itself
+        logger.exception("Could not record run of job %s", job_name)
+
+
+def tracked_job(job_name: str):
+    """Record every run of the decorated job in job_runs, with its duration."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started_at = datetime.now(timezone.utc).replace(tzinfo=None)
+            started = time.perf_counter()
+            error = None
+            try:
+                return await func(*args, **kwargs)
+            except Exception as exc:
+                error = repr(exc)
+                _job_failures.inc()
+                raise
+            finally:
+                _job_runs.inc()
+                await _record_run(
+                    job_name, started_at, time.perf_counter() - started, error
+                )
+
+        return wrapper
+
+    return decorator
+
+
+def _utc_naive(value: datetime) -> datetime:
+    # discount_end_date is stored as naive UTC
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+@tracked_job("deactivate_expired_discounts")
+async def deactivate_expired_discounts(product_ids: list[int] | None = None) -> int:
+    """Switch off every discount past its end date (only ``product_ids`` if given)."""
     async with AsyncSessionLocal() as db:
         now = datetime.now(timezone.utc).replace(tzinfo=None)
         stmt = (
@@ -12,9 +90,136 @@ async def deactivate_expired_discounts():
             .where(
                 Product.has_discount == True,
                 Product.discount_end_date != None,
-                Product.discount_end_date < now,
+                Product.discount_end_date <= now,
+            )
+            .values(
+                has_discount=False,
+                discount_percentage=0.0,
+                effective_price=Product.price,
             )
-            .values(has_discount=False, discount_percentage=0.0)
         )
-        await db.execute(stmt)
+        if product_ids is not None:
+            stmt = stmt.where(Product.id.in_(product_ids))
+        result = await db.execute(stmt)
+        await db.commit()
+    if result.rowcount:
+        _discounts_expired.inc(result.rowcount)
+        await invalidate_catalog()
+    return result.rowcount
+
+
+# ── Exact-time discount expiry ─────────────────────────────────────────────
+class DiscountExpiryTimer:
+    """
+    Min-heap of upcoming (discount_end_date, product_id) with one event-loop
+    timer armed for the earliest entry, so each discount ends at its exact
+    time and only the due products are updated.
+
+    The heap holds the next ``discount_expiry_batch_size`` end dates from the
+    database plus whatever ProductService schedules in this process. It is
+    reloaded when it drains and every ``discount_expiry_resync_seconds``,
+    which also picks up writes made by other processes. Entries made stale
+    by a later edit are harmless: the UPDATE re-checks the stored end date.
+
+    Only runs in the scheduler leader (see app.core.leader); ``schedule`` is
+    a no-op elsewhere.
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[datetime, int]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._task: asyncio.Task | None = None
+        self._next_resync = 0.0
+        self._not_before = 0.0  # backoff after a failed run
+        self._running = False
+
+    async def start(self) -> None:
+        self._running = True
+        await self._resync()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._heap.clear()
+
+    def schedule(self, product_id: int, end_date: datetime | None) -> None:
+        """Track a discount end date set by a product write."""
+        if not self._running or end_date is None:
+            return
+        heapq.heappush(self._heap, (_utc_naive(end_date), product_id))
+        self._arm()
+
+    async def _resync(self) -> None:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Product.discount_end_date, Product.id)
+                .where(Product.has_discount == True, Product.discount_end_date != None)
+                .order_by(Product.discount_end_date)
+                .limit(settings.discount_expiry_batch_size)
+            )
+            # Already in ascending order, hence a valid heap
+            self._heap = [(end_date, product_id) for end_date, product_id in result]
+        loop = asyncio.get_running_loop()
+        self._next_resync = loop.time() + settings.discount_expiry_resync_seconds
+        self._arm()
+
+    def _arm(self) -> None:
+        if not self._running or (self._task and not self._task.done()):
+            return  # a running expiry re-arms when it finishes
+        if self._timer is not None:
+            self._timer.cancel()
+        loop = asyncio.get_running_loop()
+        wake_at = self._next_resync
+        if self._heap:
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            delay = (self._heap[0][0] - now).total_seconds()
+            wake_at = min(wake_at, loop.time() + max(0.0, delay))
+        self._timer = loop.call_at(max(wake_at, self._not_before), self._wake)
+
+    def _wake(self) -> None:
+        self._timer = None
+        self._task = asyncio.create_task(self._expire_due())
+
+    async def _expire_due(self) -> None:
+        loop = asyncio.get_running_loop()
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        due: list[tuple[datetime, int]] = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap))
+        try:
+            if due:
+                await deactivate_expired_discounts(
+                    [product_id for _, product_id in due]
+                )
+            if not self._heap or loop.time() >= self._next_resync:
+                await self._resync()
+            self._not_before = 0.0
+        except Exception:
+            logger.exception("Discount expiry failed, retrying in 30s")
+            for entry in due:
+                heapq.heappush(self._heap, entry)
+            self._not_before = loop.time() + 30
+        finally:
+            self._task = None
+            self._arm()
+
+
+discount_expiry = DiscountExpiryTimer()
+
+
+@tracked_job("collect_orphan_image_files")
+async def collect_orphan_image_files():
+    async with AsyncSessionLocal() as db:
+        await collect_orphan_images(db)
+
+
+@tracked_job("prune_job_runs")
+async def prune_job_runs():
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(
+        days=settings.job_run_retention_days
+    )
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(JobRun).where(JobRun.started_at < cutoff))
         await db.commit()
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, Field, field_validator
-from typing import Optional, List
-from datetime import datetime
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import Dict, Optional, List
+from datetime import datetime, timezone
 from decimal import Decimal
 from pydantic import EmailStr
 
@@ -115,6 +115,8 @@ class ProductImageRead(BaseModel):
     id: int
     image_url: str
     is_main: bool
+    variants: Optional[Dict[str, Dict[str, str]]] = None  # variant -> format -> URL
+    placeholder: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -123,12 +125,55 @@ class ProductImageRead(BaseModel):
 # ── Product Read Schemas ───────────────────────────────────────────────────
 
 
+def _hide_expired_discount(product):
+    # The expiry timer switches discounts off at their end date; until that
+    # UPDATE lands, never serve a discount that has already ended
+    end_date = product.discount_end_date
+    if not product.has_discount or end_date is None:
+        return product
+    if end_date.tzinfo is not None:
+        end_date = end_date.astimezone(timezone.utc).replace(tzinfo=None)
+    if end_date <= datetime.now(timezone.utc).replace(tzinfo=None):
+        product.has_discount = False
+        product.discount_percentage = 0.0
+        product.current_price = product.price
+    return product
+
+
 class ProductRead(ProductBase):
     id: int
     current_price: Decimal
     categories: List[CategoryInProduct] = []
     images: List[ProductImageRead] = []
 
+    @model_validator(mode="after")
+    def hide_expired_discount(self):
+        return _hide_expired_discount(self)
+
+    class Config:
+        from_attributes = True
+
+
+# ── Product Card Schema (compact listing projection) ───────────────────────
+
+
+class ProductCard(BaseModel):
+    id: int
+    name: str
+    price: Decimal
+    # Read from the stored effective_price column
+    current_price: Decimal = Field(validation_alias="effective_price")
+    has_discount: bool
+    discount_percentage: Optional[float] = 0.0
+    discount_end_date: Optional[datetime] = None
+    main_image_url: Optional[str] = None
+    main_image_variants: Optional[Dict[str, Dict[str, str]]] = None
+    main_image_placeholder: Optional[str] = None
+
+    @model_validator(mode="after")
+    def hide_expired_discount(self):
+        return _hide_expired_discount(self)
+
     class Config:
         from_attributes = True
 
@@ -142,6 +187,41 @@ class ProductListResponse(BaseModel):
     page: int
     page_size: int
     pages: int
+    next_cursor: Optional[str] = None
+    total_is_estimate: bool = False
+
+
+class ProductCardListResponse(BaseModel):
+    items: List[ProductCard]
+    total: int
+    page: int
+    page_size: int
+    pages: int
+    next_cursor: Optional[str] = None
+    total_is_estimate: bool = False
+
+
+# ── Facet Schemas ──────────────────────────────────────────────────────────
+
+
+class CategoryFacet(BaseModel):
+    id: int
+    name: str
+    count: int
+
+
+class PriceBucketFacet(BaseModel):
+    min: Optional[Decimal] = None  # inclusive, None = no lower bound
+    max: Optional[Decimal] = None  # exclusive, None = no upper bound
+    count: int
+
+
+class ProductFacetsResponse(BaseModel):
+    total: int
+    categories: List[CategoryFacet]
+    with_discount: int
+    without_discount: int
+    price_buckets: List[PriceBucketFacet]
 
 
 # ── Auth Schemas ───────────────────────────────────────────────────────────
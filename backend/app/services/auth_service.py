@@ -3,7 +3,7 @@ from sqlalchemy import select
 from fastapi import HTTPException, status
 from app.models import User, UserRole
 from app.schemas import UserCreate
-from app.core.security import hash_password, verify_password
+from app.core.security import hash_password_async, verify_password_async
 
 
 # ── Auth Service ───────────────────────────────────────────────────────────
@@ -21,7 +21,7 @@ async def register_user(db: AsyncSession, data: UserCreate) -> User:
         )
     user = User(
         email=data.email,
-        hashed_password=hash_password(data.password),
+        hashed_password=await hash_password_async(data.password),
         full_name=data.full_name,
         phone=data.phone,
         role=UserRole.customer,
@@ -34,7 +34,7 @@ async def register_user(db: AsyncSession, data: UserCreate) -> User:
 
 async def authenticate_user(db: AsyncSession, email: str, password: str) -> User:
     user = await get_user_by_email(db, email)
-    if not user or not verify_password(password, user.hashed_password):
+    if not user or not await verify_password_async(password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email o la contraseña incorrectos",
@@ -1,9 +1,81 @@
 from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
 from app import schemas
-from app.models import Category
+from app.models import Category, category_closure_table
+from app.core.cache import invalidate_catalog
+from app.services.category_snapshot import (
+    get_category_snapshot,
+    load_category_snapshot,
+)
+
+closure = category_closure_table
+
+
+def _insert_closure_ignoring_duplicates(dialect: str):
+    # Every worker runs ensure_closure at startup; when two of them rebuild
+    # an empty table at once the later insert finds the rows already there
+    if dialect == "postgresql":
+        return postgresql.insert(closure).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(closure).on_conflict_do_nothing()
+    return insert(closure)
+
+
+# ── Closure table maintenance ──────────────────────────────────────────────
+async def _attach_subtree(
+    db: AsyncSession, category_id: int, parent_id: int | None
+) -> None:
+    """Link every node of category_id's subtree to parent_id and its ancestors."""
+    if parent_id is None:
+        return
+    subtree = (
+        await db.execute(
+            select(closure.c.descendant_id, closure.c.depth).where(
+                closure.c.ancestor_id == category_id
+            )
+        )
+    ).all()
+    ancestors = (
+        await db.execute(
+            select(closure.c.ancestor_id, closure.c.depth).where(
+                closure.c.descendant_id == parent_id
+            )
+        )
+    ).all()
+    rows = [
+        {
+            "ancestor_id": ancestor_id,
+            "descendant_id": descendant_id,
+            "depth": ancestor_depth + descendant_depth + 1,
+        }
+        for ancestor_id, ancestor_depth in ancestors
+        for descendant_id, descendant_depth in subtree
+    ]
+    if rows:
+        await db.execute(insert(closure), rows)
+
+
+async def _detach_subtree(db: AsyncSession, category_id: int) -> None:
+    """Remove the links between category_id's subtree and its old ancestors."""
+    subtree_ids = (
+        (
+            await db.execute(
+                select(closure.c.descendant_id).where(
+                    closure.c.ancestor_id == category_id
+                )
+            )
+        )
+        .scalars()
+        .all()
+    )
+    await db.execute(
+        delete(closure).where(
+            closure.c.descendant_id.in_(subtree_ids),
+            closure.c.ancestor_id.not_in(subtree_ids),
+        )
+    )
 
 
 # ── Category Service ───────────────────────────────────────────────────────
@@ -18,15 +90,9 @@ class CategoryService:
 
     # ── Get category tree (super cats + children) ──────────────────────────
     @staticmethod
-    async def get_category_tree(db: AsyncSession) -> list[Category]:
-        result = await db.execute(
-            select(Category)
-            .options(selectinload(Category.children))
-            .where(Category.is_super == True)
-            .order_by(Category.sort_order, Category.id)
-        )
-
-        return result.scalars().all()
+    async def get_category_tree(db: AsyncSession) -> list[dict]:
+        snapshot = await get_category_snapshot(db)
+        return snapshot.tree()
 
     # ── Create ─────────────────────────────────────────────────────────────
     @staticmethod
@@ -64,7 +130,16 @@ class CategoryService:
             sort_order=new_data.sort_order,
         )
         db.add(category)
+        await db.flush()
+        await db.execute(
+            insert(closure).values(
+                ancestor_id=category.id, descendant_id=category.id, depth=0
+            )
+        )
+        await _attach_subtree(db, category.id, category.parent_id)
         await db.commit()
+        await invalidate_catalog()
+        await load_category_snapshot(db)
         await db.refresh(category)
         return category
 
@@ -103,6 +178,22 @@ class CategoryService:
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="El padre debe ser una super categoría",
                 )
+            # The new parent can't be inside the category's own subtree
+            cycle = await db.execute(
+                select(closure.c.depth).where(
+                    closure.c.ancestor_id == category_id,
+                    closure.c.descendant_id == updated_data.parent_id,
+                )
+            )
+            if cycle.first() is not None:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="La categoría no puede colgar de una de sus subcategorías",
+                )
+
+        if updated_data.parent_id != category.parent_id:
+            await _detach_subtree(db, category_id)
+            await _attach_subtree(db, category_id, updated_data.parent_id)
 
         category.name = updated_data.name
         category.description = updated_data.description
@@ -112,6 +203,8 @@ class CategoryService:
         category.sort_order = updated_data.sort_order
 
         await db.commit()
+        await invalidate_catalog()
+        await load_category_snapshot(db)
         await db.refresh(category)
         return category
 
@@ -125,5 +218,54 @@ class CategoryService:
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="La categoría que intentas borrar ya no existe.",
             )
+        # Its children become roots (the ORM nulls their parent_id), so each
+        # child subtree loses every ancestor above it, not only this node
+        child_ids = (
+            await db.scalars(
+                select(Category.id).where(Category.parent_id == category_id)
+            )
+        ).all()
+        for child_id in child_ids:
+            await _detach_subtree(db, child_id)
+        await db.execute(
+            delete(closure).where(
+                (closure.c.ancestor_id == category_id)
+                | (closure.c.descendant_id == category_id)
+            )
+        )
         await db.delete(category)
         await db.commit()
+        await invalidate_catalog()
+        await load_category_snapshot(db)
+
+    # ── Rebuild the closure table from parent_id links ─────────────────────
+    @staticmethod
+    async def rebuild_closure(db: AsyncSession) -> None:
+        result = await db.execute(select(Category.id, Category.parent_id))
+        parents = dict(result.all())
+        rows = []
+        for category_id in parents:
+            ancestor_id, depth = category_id, 0
+            while ancestor_id is not None and depth <= len(parents):
+                rows.append(
+                    {
+                        "ancestor_id": ancestor_id,
+                        "descendant_id": category_id,
+                        "depth": depth,
+                    }
+                )
+                ancestor_id, depth = parents.get(ancestor_id), depth + 1
+        await db.execute(delete(closure))
+        if rows:
+            await db.execute(
+                _insert_closure_ignoring_duplicates(db.bind.dialect.name), rows
+            )
+        await db.commit()
+
+    # ── Backfill the closure table for databases that predate it ───────────
+    @staticmethod
+    async def ensure_closure(db: AsyncSession) -> None:
+        closure_rows = await db.scalar(select(func.count()).select_from(closure))
+        categories = await db.scalar(select(func.count()).select_from(Category))
+        if closure_rows == 0 and categories:
+            await CategoryService.rebuild_closure(db)
@@ -0,0 +1,117 @@
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.core.cache import catalog_version
+from app.models import Category
+
+settings = get_settings()
+
+
+# ── Snapshot types ─────────────────────────────────────────────────────────
+@dataclass(frozen=True)
+class CategoryNode:
+    id: int
+    name: str
+    description: Optional[str]
+    is_super: bool
+    parent_id: Optional[int]
+    image_url: Optional[str]
+    background_color: Optional[str]
+    sort_order: int
+
+
+@dataclass(frozen=True)
+class CategorySnapshot:
+    """
+    Immutable view of the whole category hierarchy. Never mutated: a write
+    builds a new snapshot and swaps the module-level reference.
+    """
+
+    version: str
+    loaded_at: float  # time.monotonic() when built
+    categories: tuple[CategoryNode, ...]  # ordered by (sort_order, id)
+    children: Mapping[Optional[int], tuple[CategoryNode, ...]]
+
+    def tree(self) -> list[dict]:
+        """Super categories with their direct children (CategoryTree shape)."""
+        return [
+            {
+                "id": node.id,
+                "name": node.name,
+                "sort_order": node.sort_order,
+                "children": self.children.get(node.id, ()),
+            }
+            for node in self.categories
+            if node.is_super
+        ]
+
+
+def _build(version: str, rows: list[Category]) -> CategorySnapshot:
+    nodes = tuple(
+        CategoryNode(
+            id=row.id,
+            name=row.name,
+            description=row.description,
+            is_super=bool(row.is_super),
+            parent_id=row.parent_id,
+            image_url=row.image_url,
+            background_color=row.background_color,
+            sort_order=row.sort_order,
+        )
+        for row in sorted(rows, key=lambda row: (row.sort_order, row.id))
+    )
+
+    children: dict[Optional[int], list[CategoryNode]] = {}
+    for node in nodes:
+        children.setdefault(node.parent_id, []).append(node)
+
+    return CategorySnapshot(
+        version=version,
+        loaded_at=time.monotonic(),
+        categories=nodes,
+        children=MappingProxyType(
+            {parent: tuple(group) for parent, group in children.items()}
+        ),
+    )
+
+
+# ── Process-wide snapshot ──────────────────────────────────────────────────
+_snapshot: Optional[CategorySnapshot] = None
+
+
+async def load_category_snapshot(db: AsyncSession) -> CategorySnapshot:
+    """Rebuild the snapshot from the database and swap it in."""
+    global _snapshot
+    version = await catalog_version()
+    result = await db.execute(select(Category))
+    _snapshot = _build(version, list(result.scalars().all()))
+    return _snapshot
+
+
+def _expired(snapshot: CategorySnapshot) -> bool:
+    return time.monotonic() - snapshot.loaded_at >= settings.response_cache_ttl_seconds
+
+
+async def get_category_snapshot(db: AsyncSession) -> CategorySnapshot:
+    """
+    Current snapshot, rebuilt when the catalog version moved since it was
+    taken or once it is older than the response cache TTL.
+
+    The version only reflects writes handled by other workers with the
+    shared (Redis) cache backend; with the per-process memory backend the
+    TTL is what bounds how stale another worker's write can leave it.
+    """
+    snapshot = _snapshot
+    if (
+        snapshot is None
+        or _expired(snapshot)
+        or snapshot.version != await catalog_version()
+    ):
+        snapshot = await load_category_snapshot(db)
+    return snapshot
@@ -0,0 +1,250 @@
+import glob
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.config import get_settings
+from app.core import metrics
+from app.models import Category, ProductImage
+from app.services.image_storage import image_path, remove_image_files
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# {stem}_{variant}.{format} files written by the variant pipeline
+_VARIANT_NAME = re.compile(r"^(?P<stem>.+)_(?:thumbnail|card|detail)\.(?:webp|avif)$")
+# Extensions of sniffed uploads, tried before listing the directory
+_ORIGINAL_EXTENSIONS = (".jpg", ".png", ".webp")
+# Pre-compressed copies served by app.core.static_files
+_SIDECAR_EXTENSIONS = (".br", ".gz")
+_SAMPLE_SIZE = 20
+
+_reclaimed_files = metrics.counter(
+    "shop_image_gc_reclaimed_files_total", "Orphaned image files removed by the GC"
+)
+_reclaimed_bytes = metrics.counter(
+    "shop_image_gc_reclaimed_bytes_total", "Bytes freed by the image GC"
+)
+_last_dangling = 0
+metrics.gauge(
+    "shop_image_gc_dangling_urls",
+    "Image URLs without a file on disk, as of the last GC run",
+    lambda: _last_dangling,
+)
+
+
+@dataclass
+class ImageGCReport:
+    scanned_files: int = 0
+    orphaned_files: int = 0
+    reclaimed_bytes: int = 0
+    dangling_urls: int = 0
+    orphan_sample: list[str] = field(default_factory=list)
+    dangling_sample: list[str] = field(default_factory=list)
+
+
+# ── Directory side ─────────────────────────────────────────────────────────
+def _next_batch(entries, size: int, min_age_cutoff: float) -> tuple[list, int]:
+    """Up to ``size`` regular files older than the cutoff, plus how many were seen."""
+    batch, seen = [], 0
+    for entry in islice(entries, size):
+        seen += 1
+        try:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            stat_result = entry.stat(follow_symlinks=False)
+        except FileNotFoundError:
+            continue  # removed meanwhile, e.g. as a variant of a reclaimed file
+        if stat_result.st_mtime < min_age_cutoff:
+            batch.append((entry.name, entry.path, stat_result.st_size))
+    return batch, seen
+
+
+def _still_stale(path: str, min_age_cutoff: float) -> bool:
+    # An upload of identical bytes replaces the file (fresh mtime) before
+    # inserting its row; such a file is no longer an orphan candidate
+    try:
+        return os.stat(path).st_mtime < min_age_cutoff
+    except FileNotFoundError:
+        return False
+
+
+def _remove_if_present(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _original_exists(directory: str, stem: str) -> bool:
+    if any(
+        os.path.exists(os.path.join(directory, stem + extension))
+        for extension in _ORIGINAL_EXTENSIONS
+    ):
+        return True
+    # Legacy uploads kept the client's extension (.jfif, .Jpg, none at all):
+    # any other file named {stem} or {stem}.{ext} is the original
+    pattern = os.path.join(glob.escape(directory), f"{glob.escape(stem)}*")
+    for path in glob.glob(pattern):
+        name = os.path.basename(path)
+        base_name, extension = os.path.splitext(name)
+        if (
+            base_name == stem
+            and extension not in (*_SIDECAR_EXTENSIONS, ".part")
+            and not _VARIANT_NAME.match(name)
+        ):
+            return True
+    return False
+
+
+async def _referenced(db: AsyncSession, urls: list[str]) -> set[str]:
+    if not urls:
+        return set()
+    product_urls = await db.scalars(
+        select(ProductImage.image_url).where(ProductImage.image_url.in_(urls))
+    )
+    category_urls = await db.scalars(
+        select(Category.image_url).where(Category.image_url.in_(urls))
+    )
+    return set(product_urls) | set(category_urls)
+
+
+async def _collect_directory(
+    db: AsyncSession, directory: str, report: ImageGCReport, dry_run: bool
+) -> None:
+    if not os.path.isdir(directory):
+        return
+    # Files younger than the grace period may belong to an upload whose
+    # row isn't committed yet
+    cutoff = time.time() - settings.image_gc_grace_seconds
+    base_url = f"/{directory.replace(os.sep, '/').strip('/')}"
+
+    with os.scandir(directory) as entries:
+        while True:
+            batch, seen = await run_in_threadpool(
+                _next_batch, entries, settings.image_gc_batch_size, cutoff
+            )
+            if not seen:
+                break
+            report.scanned_files += seen
+
+            originals, sidecars, orphans = [], [], []
+            for name, path, size in batch:
+                if name.endswith(".part"):
+                    # Abandoned temp file of a crashed upload or render
+                    orphans.append((path, size, None))
+                    continue
+                if name.startswith("."):
+                    continue  # .gitkeep and friends
+                base_name, extension = os.path.splitext(name)
+                if extension in _SIDECAR_EXTENSIONS:
+                    # {name}.br / {name}.gz follow the file they compress
+                    sidecars.append((f"{base_url}/{base_name}", base_name, path, size))
+                    continue
+                variant = _VARIANT_NAME.match(name)
+                if variant:
+                    # Variants live and die with their original file
+                    if not _original_exists(directory, variant["stem"]):
+                        orphans.append((path, size, None))
+                    continue
+                originals.append((f"{base_url}/{name}", path, size))
+
+            referenced = await _referenced(
+                db,
+                [url for url, _, _ in originals] + [url for url, *_ in sidecars],
+            )
+            orphans += [
+                (path, size, url)
+                for url, path, size in originals
+                if url not in referenced
+            ]
+            orphans += [
+                (path, size, None)
+                for url, base_name, path, size in sidecars
+                if url not in referenced
+                and not os.path.exists(os.path.join(directory, base_name))
+            ]
+
+            for path, size, url in orphans:
+                if not await run_in_threadpool(_still_stale, path, cutoff):
+                    continue
+                report.orphaned_files += 1
+                report.reclaimed_bytes += size
+                if len(report.orphan_sample) < _SAMPLE_SIZE:
+                    report.orphan_sample.append(path)
+                if dry_run:
+                    continue
+                if url is not None:
+                    await remove_image_files([url])  # original plus variants
+                else:
+                    await run_in_threadpool(_remove_if_present, path)
+                _reclaimed_files.inc()
+                _reclaimed_bytes.inc(size)
+
+
+# ── Database side ──────────────────────────────────────────────────────────
+async def _count_dangling(db: AsyncSession, column, report: ImageGCReport) -> None:
+    """Keyset-walk a table's image URLs and count the ones without a file."""
+    id_column = column.class_.id
+    last_id = 0
+    while True:
+        rows = (
+            await db.execute(
+                select(id_column, column)
+                .where(id_column > last_id, column.is_not(None))
+                .order_by(id_column)
+                .limit(settings.image_gc_batch_size)
+            )
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        paths = [image_path(url) for _, url in rows]
+        exists = await run_in_threadpool(lambda: [os.path.exists(p) for p in paths])
+        for (_, url), found in zip(rows, exists):
+            if not found:
+                report.dangling_urls += 1
+                if len(report.dangling_sample) < _SAMPLE_SIZE:
+                    report.dangling_sample.append(url)
+
+
+async def collect_orphan_images(
+    db: AsyncSession, dry_run: bool | None = None
+) -> ImageGCReport:
+    """
+    Reconcile the image directories with product_images and categories:
+    remove files no row references (after a grace period) and report URLs
+    whose file is missing. Both sides are walked in bounded batches.
+    """
+    global _last_dangling
+    if dry_run is None:
+        dry_run = settings.image_gc_dry_run
+    report = ImageGCReport()
+    for directory in (settings.product_images_dir, settings.categories_images_dir):
+        await _collect_directory(db, directory, report, dry_run)
+    await _count_dangling(db, ProductImage.image_url, report)
+    await _count_dangling(db, Category.image_url, report)
+    _last_dangling = report.dangling_urls
+
+    if report.orphaned_files:
+        logger.warning(
+            "Image GC: %s %d orphaned files (%d bytes), e.g. %s",
+            "found" if dry_run else "removed",
+            report.orphaned_files,
+            report.reclaimed_bytes,
+            report.orphan_sample[:5],
+        )
+    if report.dangling_urls:
+        logger.warning(
+            "Image GC: %d image URLs point at missing files, e.g. %s",
+            report.dangling_urls,
+            report.dangling_sample[:5],
+        )
+    return report
@@ -0,0 +1,144 @@
+import glob
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO
+
+from fastapi import HTTPException, UploadFile, status
+from sqlalchemy import exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.config import get_settings
+from app.models import Category, ProductImage
+
+settings = get_settings()
+
+CHUNK_SIZE = 64 * 1024
+
+# Leading bytes -> (mime type, extension); the client's content_type and
+# filename are never trusted
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png", ".png"),
+)
+
+
+def sniff_image_type(head: bytes) -> tuple[str, str] | None:
+    """(mime type, extension) for a supported image header, else None."""
+    for signature, mime, extension in _SIGNATURES:
+        if head.startswith(signature):
+            return mime, extension
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp", ".webp"
+    return None
+
+
+def image_path(image_url: str) -> str:
+    """Filesystem path of a stored image from its public /static/... URL."""
+    return os.path.join(
+        settings.static_dir, image_url.removeprefix("/static/").lstrip("/")
+    )
+
+
+def _remove_files(paths: list[str]) -> None:
+    for path in paths:
+        directory, filename = os.path.split(path)
+        stem = os.path.splitext(filename)[0]
+        # The original, its .br/.gz sidecars and its derived
+        # {stem}_{variant}.{format} files (sidecars included)
+        pattern = os.path.join(glob.escape(directory), f"{glob.escape(stem)}_*")
+        for file_path in [path, f"{path}.br", f"{path}.gz", *glob.glob(pattern)]:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+
+async def remove_image_files(image_urls: list[str]) -> None:
+    """
+    Delete the files behind the given URLs, variants included. Only for
+    files nothing references any more; see release_image_files.
+    """
+    await run_in_threadpool(_remove_files, [image_path(url) for url in image_urls])
+
+
+async def _is_referenced(db: AsyncSession, image_url: str) -> bool:
+    return bool(
+        await db.scalar(
+            select(
+                exists().where(ProductImage.image_url == image_url)
+                | exists().where(Category.image_url == image_url)
+            )
+        )
+    )
+
+
+async def release_image_files(db: AsyncSession, image_urls: list[str]) -> None:
+    """
+    Drop the files behind image_urls that no product image or category
+    references any more. Files are content-addressed and shared, so the
+    reference count is the number of rows pointing at the URL; call after
+    committing the change that removed a reference.
+    """
+    unreferenced = [url for url in set(image_urls) if not await _is_referenced(db, url)]
+    if unreferenced:
+        await remove_image_files(unreferenced)
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Imagen demasiado grande. Máximo {settings.max_image_size_mb}MB",
+    )
+
+
+def _stream_to_disk(source: BinaryIO, target_dir: str, max_bytes: int) -> str:
+    source.seek(0)
+    chunk = source.read(CHUNK_SIZE)
+    sniffed = sniff_image_type(chunk)
+    if sniffed is None or sniffed[0] not in settings.allowed_image_types:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El archivo no es una imagen válida. Usa png, jpeg, webp",
+        )
+
+    # Written next to its final location so the rename is atomic; readers
+    # never see a half-written image
+    fd, temp_path = tempfile.mkstemp(dir=target_dir, prefix=".upload-", suffix=".part")
+    try:
+        digest = hashlib.sha256()
+        with os.fdopen(fd, "wb") as target:
+            written = 0
+            while chunk:
+                written += len(chunk)
+                if written > max_bytes:
+                    raise _too_large()
+                digest.update(chunk)
+                target.write(chunk)
+                chunk = source.read(CHUNK_SIZE)
+            target.flush()
+            os.fsync(target.fileno())
+        # Named by content: identical uploads share one file (and one browser
+        # cache entry). Replacing an existing copy is harmless, same bytes.
+        filename = f"{digest.hexdigest()}{sniffed[1]}"
+        os.replace(temp_path, os.path.join(target_dir, filename))
+        return filename
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+async def save_image_upload(image_file: UploadFile, target_dir: str) -> str:
+    """
+    Copy an uploaded image into target_dir in CHUNK_SIZE pieces and return
+    its content-addressed file name (sha256 of the bytes). Rejects non-images by their magic bytes and stops
+    copying as soon as max_image_size_mb is exceeded.
+    """
+    max_bytes = settings.max_image_size_mb * 1024 * 1024
+    # Starlette records the part size while spooling it, so most oversized
+    # uploads are refused without touching the target directory
+    if image_file.size is not None and image_file.size > max_bytes:
+        raise _too_large()
+    return await run_in_threadpool(
+        _stream_to_disk, image_file.file, target_dir, max_bytes
+    )
@@ -0,0 +1,215 @@
+import asyncio
+import base64
+import io
+import multiprocessing
+import os
+import posixpath
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.core.cache import invalidate_catalog
+from app.database import AsyncSessionLocal, dispose_engines
+from app.models import ProductImage
+from app.services.image_storage import image_path
+
+settings = get_settings()
+
+# Variant name -> maximum width in pixels; images are never upscaled
+VARIANT_WIDTHS = {"thumbnail": 160, "card": 400, "detail": 1200}
+PLACEHOLDER_WIDTH = 16
+
+Variants = dict[str, dict[str, str]]  # variant -> format -> URL (or file name)
+
+
+# ── Rendering (runs in worker processes) ───────────────────────────────────
+def _save_atomically(image, path: str, fmt: str, **options) -> None:
+    # A unique temp name: two uploads of the same bytes render the same
+    # variant names at the same time
+    fd, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=".variant-", suffix=".part"
+    )
+    try:
+        with os.fdopen(fd, "wb") as target:
+            image.save(target, format=fmt, **options)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _render_variants(source_path: str) -> tuple[Variants, str]:
+    """
+    Write every variant next to source_path as ``{stem}_{variant}.{format}``.
+    Returns (variant -> format -> file name, placeholder data URI).
+    """
+    # Imported here so the web process never pays for Pillow
+    from PIL import Image, ImageOps, features
+
+    # A few KB of PNG can declare gigapixel dimensions; refuse to decode
+    # anything above the limit instead of exhausting the worker's memory
+    Image.MAX_IMAGE_PIXELS = settings.max_image_pixels
+
+    formats = ["webp"] + (["avif"] if features.check("avif") else [])
+    directory, filename = os.path.split(source_path)
+    stem = os.path.splitext(filename)[0]
+
+    try:
+        original = Image.open(source_path)
+    except Image.DecompressionBombError as exc:
+        raise ValueError(str(exc)) from None
+    with original:
+        # Pillow only warns between 1x and 2x the limit
+        if original.width * original.height > settings.max_image_pixels:
+            raise ValueError("image exceeds max_image_pixels")
+        image = ImageOps.exif_transpose(original)
+        has_alpha = "A" in image.getbands() or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+        files: Variants = {}
+        for variant, width in VARIANT_WIDTHS.items():
+            resized = image
+            if image.width > width:
+                height = max(1, round(image.height * width / image.width))
+                resized = image.resize((width, height), Image.LANCZOS)
+            files[variant] = {}
+            for fmt in formats:
+                name = f"{stem}_{variant}.{fmt}"
+                _save_atomically(
+                    resized, os.path.join(directory, name), fmt.upper(), quality=80
+                )
+                files[variant][fmt] = name
+
+        height = max(1, round(image.height * PLACEHOLDER_WIDTH / image.width))
+        tiny = image.resize((PLACEHOLDER_WIDTH, height), Image.BILINEAR)
+        buffer = io.BytesIO()
+        tiny.save(buffer, format="WEBP", quality=30)
+        placeholder = "data:image/webp;base64," + base64.b64encode(
+            buffer.getvalue()
+        ).decode("ascii")
+
+    return files, placeholder
+
+
+# ── Process pool ───────────────────────────────────────────────────────────
+# Resizing is CPU-bound and holds the GIL, so it runs in separate processes.
+# Created on first use: importing this module must not fork.
+_variant_executor: ProcessPoolExecutor | None = None
+
+
+def _executor() -> ProcessPoolExecutor:
+    global _variant_executor
+    if _variant_executor is None:
+        # Never fork the web process: it runs threads (database drivers,
+        # the bcrypt and anyio pools) that may hold a lock at fork time and
+        # leave it locked forever in the child
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context(
+            "forkserver" if "forkserver" in methods else "spawn"
+        )
+        _variant_executor = ProcessPoolExecutor(
+            max_workers=settings.image_variant_workers, mp_context=context
+        )
+    return _variant_executor
+
+
+def _discard_executor(broken: ProcessPoolExecutor) -> None:
+    # A worker died (OOM kill, segfault in a codec): the pool refuses every
+    # later job, so drop it and let the next upload start a fresh one
+    global _variant_executor
+    if _variant_executor is broken:
+        _variant_executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_variant_pool() -> None:
+    if _variant_executor is not None:
+        _variant_executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def generate_variants(image_url: str) -> tuple[Variants | None, str | None]:
+    """
+    Render the responsive variants of a stored image. Returns
+    (variant -> format -> URL, placeholder data URI), or (None, None) when
+    image_variants_enabled is off.
+    """
+    if not settings.image_variants_enabled:
+        return None, None
+    loop = asyncio.get_running_loop()
+    executor = _executor()
+    try:
+        files, placeholder = await loop.run_in_executor(
+            executor, _render_variants, image_path(image_url)
+        )
+    except BrokenProcessPool:
+        _discard_executor(executor)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La imagen está dañada o no se puede procesar",
+        )
+    except (ValueError, OSError):
+        # Valid magic bytes but an undecodable body (truncated, corrupt),
+        # or more pixels than max_image_pixels
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La imagen está dañada o no se puede procesar",
+        )
+    base_url = posixpath.dirname(image_url)
+    variants = {
+        variant: {fmt: f"{base_url}/{name}" for fmt, name in by_format.items()}
+        for variant, by_format in files.items()
+    }
+    return variants, placeholder
+
+
+# ── Backfill ───────────────────────────────────────────────────────────────
+async def backfill_variants(db: AsyncSession, batch_size: int = 50) -> int:
+    """Generate variants for every product image stored without them."""
+    done = 0
+    last_id = 0
+    while True:
+        result = await db.execute(
+            select(ProductImage)
+            .where(ProductImage.variants.is_(None), ProductImage.id > last_id)
+            .order_by(ProductImage.id)
+            .limit(batch_size)
+        )
+        images = result.scalars().all()
+        if not images:
+            break
+        for image in images:
+            last_id = image.id
+            if not os.path.exists(image_path(image.image_url)):
+                print(f"[SKIP] {image.image_url}: archivo no encontrado")
+                continue
+            try:
+                image.variants, image.placeholder = await generate_variants(
+                    image.image_url
+                )
+            except HTTPException as exc:
+                print(f"[SKIP] {image.image_url}: {exc.detail}")
+                continue
+            done += 1
+        await db.commit()
+        print(f"[OK] {done} images processed")
+
+    await invalidate_catalog()
+    return done
+
+
+async def _backfill() -> None:
+    async with AsyncSessionLocal() as db:
+        await backfill_variants(db)
+    shutdown_variant_pool()
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    # python -m app.services.image_variants
+    asyncio.run(_backfill())
@@ -1,13 +1,213 @@
+import base64
+import binascii
+import json
+from decimal import Decimal, InvalidOperation
 from typing import List, Optional
 from fastapi import HTTPException, status
-from sqlalchemy.orm import selectinload
-from sqlalchemy import func, select
+from sqlalchemy.orm import aliased, selectinload
+from sqlalchemy import and_, case, func, literal, not_, or_, select, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
 from app import models, schemas
-from app.models import Product
-from app.models import Category
+from app.models import Product, ProductImage
+from app.models import Category, category_closure_table, product_categories_table
+from app.config import get_settings
+from app.core.cache import count_cache, invalidate_catalog
+from app.scheduler import discount_expiry
+from app.services.category_snapshot import get_category_snapshot
+from app.services.search_service import apply_search
 from datetime import datetime, timezone
 
+settings = get_settings()
+
+_BACKFILL_BATCH_SIZE = 500
+
+
+# ── Discounts past their end date ──────────────────────────────────────────
+# The expiry timer switches a discount off at its end date; until that UPDATE
+# lands the stored flag and effective_price are stale, so filters and sorts
+# read them through these expressions, as the schemas do when rendering
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _discount_active():
+    return and_(
+        Product.has_discount == True,
+        or_(Product.discount_end_date.is_(None), Product.discount_end_date > _utcnow()),
+    )
+
+
+def _live_price():
+    return case(
+        (
+            and_(Product.has_discount == True, Product.discount_end_date <= _utcnow()),
+            Product.price,
+        ),
+        else_=Product.effective_price,
+    )
+
+
+def _live_price_of(product) -> Decimal:
+    end_date = product.discount_end_date
+    if product.has_discount and end_date is not None and end_date <= _utcnow():
+        return product.price
+    return product.effective_price
+
+
+# ── Keyset pagination helpers ──────────────────────────────────────────────
+def _sort_keys(sort: Optional[str]) -> list:
+    """(expression, descending) pairs for the active sort, always ending on id."""
+    if sort == "price_asc":
+        return [(_live_price(), False), (Product.id, False)]
+    if sort == "price_desc":
+        return [(_live_price(), True), (Product.id, True)]
+    # Default / "popular": newest first by id
+    return [(Product.id, True)]
+
+
+def _encode_cursor(sort: Optional[str], product: Product) -> str:
+    if sort in ("price_asc", "price_desc"):
+        values = [str(_live_price_of(product)), str(product.id)]
+    else:
+        values = [str(product.id)]
+    raw = json.dumps({"s": sort or "popular", "v": values}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(sort: Optional[str], cursor: str) -> list:
+    invalid_cursor = HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido"
+    )
+    keys = _sort_keys(sort)
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        if data["s"] != (sort or "popular") or len(data["v"]) != len(keys):
+            raise invalid_cursor
+        return [
+            column.type.python_type(value)
+            for (column, _), value in zip(keys, data["v"])
+        ]
+    except (
+        binascii.Error,
+        UnicodeDecodeError,
+        ValueError,
+        InvalidOperation,
+        KeyError,
+        TypeError,
+    ):
+        raise invalid_cursor
+
+
+def _seek_after(sort: Optional[str], values: list):
+    """Rows strictly after ``values`` in the sort order (row-value comparison)."""
+    keys = _sort_keys(sort)
+    clauses = []
+    for i, (column, descending) in enumerate(keys):
+        step = column < values[i] if descending else column > values[i]
+        equal_prefix = [c == v for (c, _), v in zip(keys[:i], values[:i])]
+        clauses.append(and_(*equal_prefix, step))
+    return or_(*clauses)
+
+
+# ── Shared filters ─────────────────────────────────────────────────────────
+def _filtered_query(
+    db: AsyncSession,
+    q: Optional[str] = None,
+    bar_code: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    stock: Optional[int] = None,
+    price: Optional[float] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    category_id: Optional[int] = None,
+    super_category_id: Optional[int] = None,
+    has_discount: Optional[bool] = None,
+):
+    """select(Product) with the listing filters applied, plus the relevance order."""
+    query = select(Product)
+    relevance_order = None
+
+    if q:
+        query, relevance_order = apply_search(query, q, db.bind.dialect.name)
+
+    if bar_code:
+        query = query.where(Product.bar_code == bar_code)
+
+    if is_active is not None:
+        query = query.where(Product.is_active == is_active)
+
+    if stock is not None:
+        query = query.where(Product.stock_quantity == stock)
+
+    if price is not None:
+        query = query.where(Product.price == price)
+
+    # Range filters use the post-discount price, or the list price once the
+    # discount has ended
+    if min_price is not None:
+        query = query.where(_live_price() >= min_price)
+
+    if max_price is not None:
+        query = query.where(_live_price() <= max_price)
+
+    if has_discount is not None:
+        query = query.where(
+            _discount_active() if has_discount else not_(_discount_active())
+        )
+
+    if category_id is not None:
+        query = query.join(Product.categories).where(Category.id == category_id)
+    elif super_category_id is not None:
+        # ── Products anywhere below the super category (any depth) ────────
+        # Semi-join through the closure table: no duplicates, one index lookup
+        query = query.where(
+            Product.id.in_(
+                select(product_categories_table.c.product_id)
+                .join(
+                    category_closure_table,
+                    category_closure_table.c.descendant_id
+                    == product_categories_table.c.category_id,
+                )
+                .where(
+                    category_closure_table.c.ancestor_id == super_category_id,
+                    category_closure_table.c.depth > 0,
+                )
+            )
+        )
+
+    return query, relevance_order
+
+
+# ── Card projection ────────────────────────────────────────────────────────
+_CARD_COLUMNS = (
+    Product.id,
+    Product.name,
+    Product.price,
+    Product.effective_price,
+    Product.has_discount,
+    Product.discount_percentage,
+    Product.discount_end_date,
+)
+
+
+def _page_items(view: str, rows) -> list:
+    # Card rows are read column by column; full rows carry the Product entity
+    return list(rows) if view == "card" else [row[0] for row in rows]
+
+
+async def _planner_estimate(db: AsyncSession, query) -> int:
+    """Row count estimated by the Postgres planner, without executing ``query``."""
+    compiled = query.compile(
+        dialect=db.bind.dialect, compile_kwargs={"literal_binds": True}
+    )
+    conn = await db.connection()
+    result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}")
+    plan = result.scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
 
 class ProductService:
 
@@ -22,67 +222,148 @@ class ProductService:
         is_active: Optional[bool] = None,
         stock: Optional[int] = None,
         price: Optional[float] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
         category_id: Optional[int] = None,
         super_category_id: Optional[int] = None,
         has_discount: Optional[bool] = None,
         sort: Optional[str] = None,
+        cursor: Optional[str] = None,
+        total_mode: str = "exact",
+        view: str = "full",
     ) -> schemas.ProductListResponse:
 
-        query = select(Product)
-
-        if q:
-            query = query.where(Product.name.ilike(f"%{q}%"))
-
-        if bar_code:
-            query = query.where(Product.bar_code == bar_code)
-
-        if is_active is not None:
-            query = query.where(Product.is_active == is_active)
-
-        if stock is not None:
-            query = query.where(Product.stock_quantity == stock)
-
-        if price is not None:
-            query = query.where(Product.price == price)
-
-        if has_discount is not None:
-            query = query.where(Product.has_discount == has_discount)
-
-        if category_id is not None:
-            query = query.join(Product.categories).where(Category.id == category_id)
-        elif super_category_id is not None:
-            # ── Products in any child category of the super category ───────────
-            query = query.join(Product.categories).where(
-                Category.parent_id == super_category_id
-            )
+        query, relevance_order = _filtered_query(
+            db,
+            q=q,
+            bar_code=bar_code,
+            is_active=is_active,
+            stock=stock,
+            price=price,
+            min_price=min_price,
+            max_price=max_price,
+            category_id=category_id,
+            super_category_id=super_category_id,
+            has_discount=has_discount,
+        )
 
         # ── Sort ──────────────────────────────────────────────────────────────
-        if sort == "price_asc":
-            query = query.order_by(Product.price.asc())
-        elif sort == "price_desc":
-            query = query.order_by(Product.price.desc())
-        else:
-            # Default / "popular": newest first by id
+        if sort == "relevance":
+            if cursor:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="El cursor no está disponible al ordenar por relevancia",
+                )
+            if relevance_order is not None:
+                query = query.order_by(relevance_order)
             query = query.order_by(Product.id.desc())
+        else:
+            sort_keys = _sort_keys(sort)
+            query = query.order_by(
+                *[column.desc() if desc else column.asc() for column, desc in sort_keys]
+            )
 
         # ── Total y paginación ────────────────────────────────────────────────
+        count_key = (
+            q,
+            bar_code,
+            is_active,
+            stock,
+            price,
+            min_price,
+            max_price,
+            category_id,
+            super_category_id,
+            has_discount,
+        )
+        total_result = None
+        total_is_estimate = False
+        if total_mode in ("cached", "estimate"):
+            cached_total = count_cache.get(count_key)
+            if cached_total is not None:
+                total_result, total_is_estimate = cached_total
+            elif (
+                total_mode == "estimate"
+                and db.bind.dialect.name == "postgresql"
+                and not (q or bar_code)
+                and stock is None
+                and price is None
+                and min_price is None
+                and max_price is None
+                and category_id is None
+                and super_category_id is None
+                and has_discount is None
+            ):
+                # Unfiltered browsing: the planner's row estimate is good enough
+                total_result = await _planner_estimate(db, query)
+                total_is_estimate = True
+                count_cache.set(count_key, (total_result, True))
+
         # Contar total (Optimizado con subquery)
         count_query = select(func.count()).select_from(query.subquery())
-        total_result = (await db.execute(count_query)).scalar_one()
-        # Paginación y carga de relaciones
-        query = (
-            query.options(
+        if view == "card":
+            # Only the card columns plus the main image URL, in the same query
+            main_image = aliased(ProductImage)
+            query = query.outerjoin(
+                main_image,
+                and_(main_image.product_id == Product.id, main_image.is_main == True),
+            ).with_only_columns(
+                *_CARD_COLUMNS,
+                main_image.image_url.label("main_image_url"),
+                main_image.variants.label("main_image_variants"),
+                main_image.placeholder.label("main_image_placeholder"),
+            )
+        else:
+            # Carga de relaciones
+            query = query.options(
                 selectinload(Product.categories),
                 selectinload(Product.images),
             )
-            .offset((page - 1) * page_size)
-            .limit(page_size)
-        )
 
-        result = await db.execute(query)
-        items = result.scalars().all()
+        if cursor:
+            # Keyset: seek past the last row of the previous page instead of
+            # scanning and discarding every earlier row with OFFSET.
+            if total_result is None:
+                total_result = (await db.execute(count_query)).scalar_one()
+                if total_mode != "exact":
+                    count_cache.set(count_key, (total_result, False))
+            query = query.where(_seek_after(sort, _decode_cursor(sort, cursor)))
+            result = await db.execute(query.limit(page_size + 1))
+            items = _page_items(view, result.all())
+            has_next = len(items) > page_size
+            items = items[:page_size]
+        else:
+            query = query.offset((page - 1) * page_size).limit(page_size)
+            if total_result is None:
+                # Page rows and the filtered total in a single statement
+                result = await db.execute(
+                    query.add_columns(func.count().over().label("total_count"))
+                )
+                rows = result.all()
+                items = _page_items(view, rows)
+                if rows:
+                    total_result = rows[0].total_count
+                elif page == 1:
+                    total_result = 0
+                else:
+                    # Past the last page the window has no row to report on
+                    total_result = (await db.execute(count_query)).scalar_one()
+                if total_mode != "exact":
+                    count_cache.set(count_key, (total_result, False))
+            else:
+                result = await db.execute(query)
+                items = _page_items(view, result.all())
+            if total_is_estimate:
+                has_next = len(items) == page_size
+            else:
+                has_next = page * page_size < total_result
 
         pages = (total_result + page_size - 1) // page_size
+        next_cursor = (
+            _encode_cursor(sort, items[-1])
+            if has_next and items and sort != "relevance"
+            else None
+        )
 
         return {
             "items": items,
@@ -90,6 +371,108 @@ class ProductService:
             "page": page,
             "page_size": page_size,
             "pages": pages,
+            "next_cursor": next_cursor,
+            "total_is_estimate": total_is_estimate,
+        }
+
+    # ── Facet counts for the catalog sidebar ──────────────────────────────
+    @staticmethod
+    async def get_facets(
+        db: AsyncSession,
+        q: Optional[str] = None,
+        bar_code: Optional[str] = None,
+        is_active: Optional[bool] = None,
+        stock: Optional[int] = None,
+        price: Optional[float] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        category_id: Optional[int] = None,
+        super_category_id: Optional[int] = None,
+        has_discount: Optional[bool] = None,
+    ) -> schemas.ProductFacetsResponse:
+        filters = dict(
+            q=q,
+            bar_code=bar_code,
+            is_active=is_active,
+            stock=stock,
+            price=price,
+            min_price=min_price,
+            max_price=max_price,
+            category_id=category_id,
+            super_category_id=super_category_id,
+            has_discount=has_discount,
+        )
+
+        # Each facet is counted without its own filter, so the sidebar still
+        # offers the alternatives to a value the shopper already picked
+        def matching(name: str, *own_filters: str):
+            if own_filters and all(filters[key] is None for key in own_filters):
+                return base  # nothing to drop: same rows as the full filter
+            query, _ = _filtered_query(db, **{**filters, **dict.fromkeys(own_filters)})
+            return query.with_only_columns(
+                Product.id,
+                _discount_active().label("has_discount"),
+                _live_price().label("effective_price"),
+            ).cte(name)
+
+        base = matching("matching")
+        by_category = matching("matching_any_category", "category_id")
+        by_discount = matching("matching_any_discount", "has_discount")
+        by_price = matching("matching_any_price", "min_price", "max_price")
+
+        bounds = settings.facet_price_buckets
+        price_bucket = case(
+            *[
+                (by_price.c.effective_price < bound, index)
+                for index, bound in enumerate(bounds)
+            ],
+            else_=len(bounds),
+        )
+        discount_key = case((by_discount.c.has_discount == True, 1), else_=0)
+        link = product_categories_table
+
+        # ── Every facet in one grouped statement: (facet, key, count) rows ──
+        facets_query = union_all(
+            select(literal("total"), literal(0), func.count()).select_from(base),
+            select(literal("category"), link.c.category_id, func.count())
+            .join(by_category, by_category.c.id == link.c.product_id)
+            .group_by(link.c.category_id),
+            select(literal("discount"), discount_key, func.count())
+            .select_from(by_discount)
+            .group_by(discount_key),
+            select(literal("price"), price_bucket, func.count())
+            .select_from(by_price)
+            .group_by(price_bucket),
+        )
+        rows = (await db.execute(facets_query)).all()
+
+        counts: dict[str, dict[int, int]] = {
+            "total": {},
+            "category": {},
+            "discount": {},
+            "price": {},
+        }
+        for facet, key, count in rows:
+            counts[facet][key] = count
+
+        snapshot = await get_category_snapshot(db)
+        categories = [
+            {"id": node.id, "name": node.name, "count": counts["category"][node.id]}
+            for node in snapshot.categories
+            if node.id in counts["category"]
+        ]
+        edges = [None, *bounds, None]
+        price_buckets = [
+            {"min": edges[index], "max": edges[index + 1], "count": count}
+            for index, count in sorted(counts["price"].items())
+        ]
+
+        return {
+            "total": counts["total"].get(0, 0),
+            "categories": categories,
+            "with_discount": counts["discount"].get(1, 0),
+            "without_discount": counts["discount"].get(0, 0),
+            "price_buckets": price_buckets,
         }
 
     # añadir nuevo producto
@@ -127,6 +510,9 @@ class ProductService:
         # Crear registro en la BD
         db.add(product_model)
         await db.commit()
+        await invalidate_catalog()
+        if product_model.has_discount:
+            discount_expiry.schedule(product_model.id, product_model.discount_end_date)
         await db.refresh(product_model)
 
         query_full = (
@@ -193,6 +579,9 @@ class ProductService:
             setattr(product, key, value)
 
         await db.commit()
+        await invalidate_catalog()
+        if product.has_discount:
+            discount_expiry.schedule(product.id, product.discount_end_date)
         await db.refresh(product)
         return product
 
@@ -215,6 +604,7 @@ class ProductService:
 
         await db.delete(product_to_delete)
         await db.commit()
+        await invalidate_catalog()
 
         return image_urls
 
@@ -229,6 +619,38 @@ class ProductService:
 
         product.is_active = not product.is_active
         await db.commit()
+        await invalidate_catalog()
         await db.refresh(product)
 
         return product
+
+    # ── Backfill effective_price for rows that predate or bypassed it ─────
+    @staticmethod
+    async def ensure_effective_prices(db: AsyncSession) -> int:
+        """
+        Recompute effective_price wherever it disagrees with current_price,
+        walking the table in id batches. Idempotent: a database already in
+        sync is only read.
+        """
+        last_id = fixed = 0
+        while True:
+            products = (
+                await db.scalars(
+                    select(Product)
+                    .where(Product.id > last_id)
+                    .order_by(Product.id)
+                    .limit(_BACKFILL_BATCH_SIZE)
+                )
+            ).all()
+            if not products:
+                break
+            last_id = products[-1].id
+            for product in products:
+                if product.effective_price != product.current_price:
+                    product.effective_price = product.current_price
+                    fixed += 1
+            await db.commit()
+            db.expunge_all()
+        if fixed:
+            await invalidate_catalog()
+        return fixed
@@ -0,0 +1,111 @@
+import re
+from typing import Optional
+
+from sqlalchemy import column, func, literal_column, or_, table, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.sql import Select
+
+from app.models import Product
+
+# ── Search document ────────────────────────────────────────────────────────
+# Postgres only uses an expression index when the query repeats the indexed
+# expression verbatim, so both the DDL and the filter render this literal SQL.
+PG_SEARCH_DOCUMENT = (
+    "to_tsvector('simple'::regconfig, "
+    "coalesce(products.name, '') || ' ' || coalesce(products.description, ''))"
+)
+
+products_fts = table("products_fts", column("rowid"), column("rank"))
+
+
+# ── Index setup ────────────────────────────────────────────────────────────
+_POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_products_search_document ON products "
+    f"USING gin (({PG_SEARCH_DOCUMENT.replace('products.', '')}))",
+    "CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products "
+    "USING gin (name gin_trgm_ops)",
+]
+
+_SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+    "name, description, content='products', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN "
+    "INSERT INTO products_fts(rowid, name, description) "
+    "VALUES (new.id, new.name, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_au "
+    "AFTER UPDATE OF name, description ON products BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO products_fts(rowid, name, description) "
+    "VALUES (new.id, new.name, new.description); END",
+]
+
+
+async def init_search_index(engine: AsyncEngine) -> None:
+    """Create the search indexes for the active backend (idempotent)."""
+    dialect = engine.dialect.name
+    async with engine.begin() as conn:
+        if dialect == "postgresql":
+            # Requires a role allowed to CREATE EXTENSION (or pg_trgm preinstalled)
+            for statement in _POSTGRES_DDL:
+                await conn.execute(text(statement))
+        elif dialect == "sqlite":
+            existing = await conn.execute(
+                text(
+                    "SELECT 1 FROM sqlite_master "
+                    "WHERE type = 'table' AND name = 'products_fts'"
+                )
+            )
+            is_new = existing.first() is None
+            for statement in _SQLITE_DDL:
+                await conn.execute(text(statement))
+            if is_new:
+                # Index rows that existed before the FTS table did
+                await conn.execute(
+                    text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+                )
+
+
+# ── Query building ─────────────────────────────────────────────────────────
+def _fts5_query(q: str) -> Optional[str]:
+    # Quote every token so user input can never inject FTS5 syntax, and match
+    # prefixes so partially typed words still find results.
+    tokens = re.findall(r"\w+", q)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def apply_search(query: Select, q: str, dialect: str):
+    """
+    Restrict ``query`` to products matching ``q``.
+
+    Returns the filtered query and an ORDER BY expression ranking the
+    matches by relevance (best first), or None when the backend has no
+    ranking.
+    """
+    if dialect == "postgresql":
+        ts_query = func.websearch_to_tsquery(literal_column("'simple'::regconfig"), q)
+        document = literal_column(PG_SEARCH_DOCUMENT)
+        # Name ILIKE is served by the trigram index and keeps substring matches
+        query = query.where(
+            or_(document.op("@@")(ts_query), Product.name.ilike(f"%{q}%"))
+        )
+        rank = func.ts_rank(document, ts_query) + func.similarity(Product.name, q)
+        return query, rank.desc()
+
+    if dialect == "sqlite":
+        fts_query = _fts5_query(q)
+        if fts_query is not None:
+            query = query.join(products_fts, products_fts.c.rowid == Product.id).where(
+                literal_column("products_fts").op("MATCH")(fts_query)
+            )
+            # FTS5 rank is bm25(): lower is more relevant
+            return query, products_fts.c.rank.asc()
+
+    return query.where(Product.name.ilike(f"%{q}%")), None
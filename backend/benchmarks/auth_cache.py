@@ -0,0 +1,96 @@
+"""
+Requests/sec on authenticated endpoints with and without the decoded-token
+cache. Runs the app in-process against a throwaway SQLite database:
+
+    python -m benchmarks.auth_cache --seconds 5 --concurrency 16
+
+Expect about 1.1x on /auth/me. The admin endpoints do more work per request,
+so the saved token check is within run-to-run noise there.
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+# Must be set before the app (and its settings) are imported
+_DB_DIR = tempfile.mkdtemp(prefix="bench-auth-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_DB_DIR}/bench.db"
+os.environ.setdefault("LOGIN_THROTTLE_BACKEND", "none")
+
+import httpx  # noqa: E402
+
+from app import models  # noqa: E402
+from app.config import get_settings  # noqa: E402
+from app.core import security  # noqa: E402
+from app.database import AsyncSessionLocal, dispose_engines, engine  # noqa: E402
+from main import app  # noqa: E402
+
+ENDPOINTS = ["/auth/me", "/products?page_size=5", "/categories"]
+EMAIL = "bench@example.com"
+PASSWORD = "bench-password"
+
+settings = get_settings()
+
+
+async def setup() -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        db.add(
+            models.User(
+                email=EMAIL,
+                hashed_password=security.hash_password(PASSWORD),
+                role=models.UserRole.admin,
+            )
+        )
+        await db.commit()
+
+
+async def hammer(client: httpx.AsyncClient, path: str, seconds: float, workers: int):
+    deadline = time.perf_counter() + seconds
+    done = 0
+
+    async def worker():
+        nonlocal done
+        while time.perf_counter() < deadline:
+            response = await client.get(path)
+            response.raise_for_status()
+            done += 1
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    return done / seconds
+
+
+async def main(seconds: float, workers: int) -> None:
+    await setup()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+        response = await c.post(
+            "/auth/login", json={"email": EMAIL, "password": PASSWORD}
+        )
+        response.raise_for_status()
+
+        cache_size = settings.token_cache_max_entries
+        print(f"{'endpoint':<28}{'no cache':>12}{'cache':>12}{'speedup':>10}")
+        for path in ENDPOINTS:
+            settings.token_cache_max_entries = 0
+            baseline = await hammer(c, path, seconds, workers)
+            settings.token_cache_max_entries = cache_size
+            security._token_cache.clear()
+            cached = await hammer(c, path, seconds, workers)
+            print(
+                f"{path:<28}{baseline:>10.0f}/s{cached:>10.0f}/s"
+                f"{cached / baseline:>9.2f}x"
+            )
+
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(main(args.seconds, args.concurrency))
@@ -0,0 +1,217 @@
+"""
+Catalog read throughput on SQLite while admin writes are running, with the
+default rollback journal against the WAL profile of app/database.py.
+
+Like a multi-worker deployment, every client is its own process on the same
+database file: reader processes page through the product card listing while
+writer processes keep updating prices through ProductService. Each profile
+gets a fresh database (settings are read at import time, hence processes):
+
+    python -m benchmarks.sqlite_wal --seconds 5 --readers 4 --writers 1
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+PROFILES = {
+    # What the app did before: stock SQLite connection settings
+    "rollback journal": {
+        "SQLITE_WAL": "false",
+        "SQLITE_SYNCHRONOUS": "FULL",
+        "SQLITE_MMAP_SIZE_MB": "0",
+        "SQLITE_CACHE_SIZE_MB": "2",
+        "SQLITE_SINGLE_WRITER": "false",
+    },
+    "WAL profile": {},
+}
+TASKS_PER_PROCESS = 4
+PAGE_SIZE = 20
+
+
+# ── Child processes ────────────────────────────────────────────────────────
+async def seed(products: int) -> dict:
+    from decimal import Decimal
+
+    from app import models
+    from app.database import AsyncSessionLocal, dispose_engines, engine
+
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        db.add_all(
+            models.Product(
+                name=f"Producto {index}",
+                description="Producto de prueba " * 10,
+                price=Decimal("10.00"),
+                bar_code=f"bench-{index}",
+                stock_quantity=10,
+            )
+            for index in range(products)
+        )
+        await db.commit()
+    await dispose_engines()
+    return {}
+
+
+async def read_loop(products: int, start_at: float, seconds: float) -> dict:
+    from app.database import ReadSessionLocal, dispose_engines
+    from app.services.product_service import ProductService
+
+    pages = max(1, products // PAGE_SIZE)
+    latencies: list[float] = []
+    errors = 0
+    await asyncio.sleep(max(0.0, start_at - time.time()))
+    deadline = time.perf_counter() + seconds
+
+    async def task(page: int):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                async with ReadSessionLocal() as db:
+                    await ProductService.get_products(
+                        db=db, page=page % pages + 1, page_size=PAGE_SIZE, view="card"
+                    )
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            page += 7
+
+    await asyncio.gather(*(task(index) for index in range(TASKS_PER_PROCESS)))
+    await dispose_engines()
+    return {"latencies": latencies, "errors": errors}
+
+
+async def write_loop(products: int, start_at: float, seconds: float) -> dict:
+    from decimal import Decimal
+
+    from app import schemas
+    from app.database import AsyncSessionLocal, dispose_engines
+    from app.services.product_service import ProductService
+
+    writes = errors = 0
+    await asyncio.sleep(max(0.0, start_at - time.time()))
+    deadline = time.perf_counter() + seconds
+
+    async def task(product_id: int):
+        nonlocal writes, errors
+        while time.perf_counter() < deadline:
+            try:
+                async with AsyncSessionLocal() as db:
+                    await ProductService.update(
+                        db,
+                        product_id % products + 1,
+                        schemas.ProductUpdate(price=Decimal(10 + product_id % 7)),
+                    )
+                writes += 1
+            except Exception:
+                errors += 1
+            product_id += 13
+
+    await asyncio.gather(*(task(index) for index in range(TASKS_PER_PROCESS)))
+    await dispose_engines()
+    return {"writes": writes, "errors": errors}
+
+
+# ── Parent process: compare profiles ───────────────────────────────────────
+def _spawn(role: str, env: dict, args, start_at: float) -> subprocess.Popen:
+    command = [
+        sys.executable,
+        "-m",
+        "benchmarks.sqlite_wal",
+        "--role",
+        role,
+        "--products",
+        str(args.products),
+        "--seconds",
+        str(args.seconds),
+        "--start-at",
+        str(start_at),
+    ]
+    return subprocess.Popen(command, env=env, stdout=subprocess.PIPE, text=True)
+
+
+def _result(process: subprocess.Popen) -> dict:
+    output, _ = process.communicate()
+    if process.returncode:
+        raise SystemExit(f"benchmark process failed ({process.returncode})")
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_profile(overrides: dict, args) -> dict:
+    directory = tempfile.mkdtemp(prefix="bench-sqlite-")
+    env = {
+        **os.environ,
+        **overrides,
+        "DATABASE_URL": f"sqlite+aiosqlite:///{directory}/bench.db",
+        "RESPONSE_CACHE_BACKEND": "none",  # measure the database
+        "STOREFRONT_TOTAL_MODE": "exact",
+    }
+    _result(_spawn("seed", env, args, 0))
+
+    start_at = time.time() + 3  # let every process finish importing
+    readers = [_spawn("reader", env, args, start_at) for _ in range(args.readers)]
+    writers = [_spawn("writer", env, args, start_at) for _ in range(args.writers)]
+    reads = [_result(process) for process in readers]
+    writes = [_result(process) for process in writers]
+
+    latencies = sorted(value for result in reads for value in result["latencies"])
+    return {
+        "reads_per_second": len(latencies) / args.seconds,
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else 0,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0,
+        "writes_per_second": sum(result["writes"] for result in writes) / args.seconds,
+        "errors": sum(result["errors"] for result in reads + writes),
+    }
+
+
+def main(args) -> None:
+    results = {name: run_profile(env, args) for name, env in PROFILES.items()}
+    print(
+        f"{args.products} products; {args.readers} reader and {args.writers} "
+        f"writer processes x {TASKS_PER_PROCESS} tasks for {args.seconds:g}s"
+    )
+    print(
+        f"{'profile':<20}{'reads/s':>10}{'p50':>10}{'p99':>10}"
+        f"{'writes/s':>10}{'errors':>8}"
+    )
+    for name, result in results.items():
+        print(
+            f"{name:<20}{result['reads_per_second']:>10.0f}"
+            f"{result['p50_ms']:>8.1f}ms{result['p99_ms']:>8.1f}ms"
+            f"{result['writes_per_second']:>10.0f}{result['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=1)
+    parser.add_argument("--role", choices=("seed", "reader", "writer"))
+    parser.add_argument("--start-at", type=float, default=0)
+    args = parser.parse_args()
+    if args.role == "seed":
+        print(json.dumps(asyncio.run(seed(args.products))))
+    elif args.role == "reader":
+        print(
+            json.dumps(
+                asyncio.run(read_loop(args.products, args.start_at, args.seconds))
+            )
+        )
+    elif args.role == "writer":
+        print(
+            json.dumps(
+                asyncio.run(write_loop(args.products, args.start_at, args.seconds))
+            )
+        )
+    else:
+        main(args)
@@ -0,0 +1,127 @@
+"""
+Catalog image serving: plain StaticFiles against CachedStaticFiles.
+
+Serves a directory of content-addressed images from both mounts in-process
+and measures first-visit GET throughput and the cost of a revisit, with a
+client that honours Cache-Control the way a browser does (fresh entries are
+not requested, stale ones are revalidated with If-None-Match):
+
+    python -m benchmarks.static_files --images 200 --rounds 5
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI
+from fastapi.staticfiles import StaticFiles
+
+from app.core.static_files import CachedStaticFiles
+
+CONCURRENCY = 16
+
+
+def make_images(directory: str, count: int, size: int) -> list[str]:
+    names = []
+    for _ in range(count):
+        data = os.urandom(size)
+        name = f"{hashlib.sha256(data).hexdigest()}.webp"
+        with open(os.path.join(directory, name), "wb") as file:
+            file.write(data)
+        names.append(name)
+    return names
+
+
+class BrowserCache:
+    """Just enough of an HTTP cache to replay a catalog revisit."""
+
+    def __init__(self):
+        self.entries: dict[str, tuple[float, str | None]] = {}
+        self.requests = 0
+
+    async def get(self, client: httpx.AsyncClient, url: str) -> None:
+        expires_at, etag = self.entries.get(url, (0.0, None))
+        if time.monotonic() < expires_at:
+            return
+        headers = {"If-None-Match": etag} if etag else {}
+        self.requests += 1
+        response = await client.get(url, headers=headers)
+        assert response.status_code in (200, 304), response.status_code
+        cache_control = response.headers.get("cache-control", "")
+        match = re.search(r"max-age=(\d+)", cache_control)
+        max_age = int(match.group(1)) if match else 0
+        if "no-cache" in cache_control:
+            max_age = 0
+        self.entries[url] = (
+            time.monotonic() + max_age,
+            response.headers.get("etag", etag),
+        )
+
+
+async def run_all(client, urls, fetch) -> float:
+    queue = list(urls)
+    started = time.perf_counter()
+
+    async def worker():
+        while queue:
+            await fetch(client, queue.pop())
+
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    return time.perf_counter() - started
+
+
+async def bench(mount: StaticFiles, urls: list[str], rounds: int) -> dict:
+    app = FastAPI()
+    app.mount("/static", mount, name="static")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+
+        async def plain_get(client, url):
+            (await client.get(url)).raise_for_status()
+
+        elapsed = sum([await run_all(c, urls, plain_get) for _ in range(rounds)])
+        cold_rps = len(urls) * rounds / elapsed
+
+        cache = BrowserCache()
+        await run_all(c, urls, cache.get)  # first visit fills the cache
+        cache.requests = 0
+        revisit = sum([await run_all(c, urls, cache.get) for _ in range(rounds)])
+        return {
+            "cold_rps": cold_rps,
+            "revisit_ms": revisit / rounds * 1000,
+            "revisit_requests": cache.requests / rounds,
+        }
+
+
+async def main(images: int, size_kb: int, rounds: int) -> None:
+    directory = tempfile.mkdtemp(prefix="bench-static-")
+    names = make_images(directory, images, size_kb * 1024)
+    urls = [f"/static/{name}" for name in names]
+
+    results = {
+        "StaticFiles": await bench(StaticFiles(directory=directory), urls, rounds),
+        "CachedStaticFiles": await bench(
+            CachedStaticFiles(directory=directory), urls, rounds
+        ),
+    }
+    print(f"{images} images x {size_kb} KiB, {rounds} rounds")
+    print(f"{'mount':<20}{'cold GET':>14}{'revisit':>14}{'requests/revisit':>20}")
+    for name, result in results.items():
+        print(
+            f"{name:<20}{result['cold_rps']:>12.0f}/s"
+            f"{result['revisit_ms']:>12.1f}ms{result['revisit_requests']:>20.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--size-kb", type=int, default=40)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.images, args.size_kb, args.rounds))
@@ -1,15 +1,24 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from app.routers import auth
 from app.core.dependencies import require_admin
-from app.database import engine
+from app.core.static_files import CachedStaticFiles
+from app.core.security import shutdown_password_pool
+from app.services.image_variants import shutdown_variant_pool
+from app.database import engine, read_engine, AsyncSessionLocal
+from app.database import dispose_engines, mark_read_primary
 from app.config import get_settings
 from app.routers.admin import categories, products, images
 from app.routers import storefront
+from app.routers import metrics
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from app.scheduler import deactivate_expired_discounts
+from app.scheduler import discount_expiry, collect_orphan_image_files, prune_job_runs
+from app.core.leader import LeaderElection, make_leader_lock
+from app.services.search_service import init_search_index
+from app.services.category_snapshot import load_category_snapshot
+from app.services.category_service import CategoryService
+from app.services.product_service import ProductService
 
 
 # ── Settings ───────────────────────────────────────────────────────────────
@@ -22,16 +31,43 @@ settings = get_settings()
 scheduler = AsyncIOScheduler()
 
 
+async def start_jobs():
+    scheduler.resume()
+    # Also switches off discounts that ended while no leader was running
+    await discount_expiry.start()
+
+
+async def stop_jobs():
+    discount_expiry.stop()
+    scheduler.pause()
+
+
+# Every worker starts the scheduler paused; only the elected leader resumes it
+leader = LeaderElection(make_leader_lock(engine), start_jobs, stop_jobs)
+
+
 # ── Lifespan ───────────────────────────────────────────────────────────────
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    scheduler.add_job(deactivate_expired_discounts, "interval", hours=1)
-    scheduler.start()
+    await init_search_index(engine)
+    async with AsyncSessionLocal() as db:
+        await CategoryService.ensure_closure(db)
+        await ProductService.ensure_effective_prices(db)
+        await load_category_snapshot(db)
+    scheduler.add_job(
+        collect_orphan_image_files, "interval", hours=settings.image_gc_interval_hours
+    )
+    scheduler.add_job(prune_job_runs, "interval", days=1)
+    scheduler.start(paused=True)
+    leader.start()
     yield
+    await leader.stop()
     scheduler.shutdown()
-    await engine.dispose()
+    shutdown_password_pool()
+    shutdown_variant_pool()
+    await dispose_engines()
 
 
 # ── App ────────────────────────────────────────────────────────────────────
@@ -55,9 +91,26 @@ app.add_middleware(
 )
 
 
+# ── Read-your-writes ───────────────────────────────────────────────────────
+# With a read replica, a client that just wrote reads from the primary for
+# a few seconds (see get_read_db) so it never sees its own write missing
+
+if read_engine is not engine:
+
+    @app.middleware("http")
+    async def read_primary_after_write(request: Request, call_next):
+        response = await call_next(request)
+        if (
+            request.method not in ("GET", "HEAD", "OPTIONS")
+            and response.status_code < 400
+        ):
+            mark_read_primary(response)
+        return response
+
+
 # ── Static Files ───────────────────────────────────────────────────────────
 
-app.mount("/static", StaticFiles(directory=settings.static_dir), name="static")
+app.mount("/static", CachedStaticFiles(directory=settings.static_dir), name="static")
 
 
 # ── Routers ────────────────────────────────────────────────────────────────
@@ -67,6 +120,8 @@ app.include_router(categories.router, dependencies=[Depends(require_admin)])
 app.include_router(products.router, dependencies=[Depends(require_admin)])
 app.include_router(images.router, dependencies=[Depends(require_admin)])
 app.include_router(storefront.router, prefix="/store", tags=["storefront"])
+if settings.metrics_enabled:
+    app.include_router(metrics.router)
 
 # ── Health Check ───────────────────────────────────────────────────────────
 